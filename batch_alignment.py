@@ -0,0 +1,180 @@
+import os
+import sys
+import csv
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+from src.actions.alignment import SCORE_THRESHOLD, AlignmentCore
+from src.support.matrix_io import MATRIX_FILE, load_matrix, load_record, save_index, save_matrix
+from src.support.matrix_registry import DEFAULT_REGISTRY, MatrixRegistry
+
+
+def argparser():
+    parser = argparse.ArgumentParser(description='batch alignment of moth image and thermal frames')
+    parser.add_argument('-p', '--pair', help='original image and its thermal frame directory',
+        nargs=2, action='append', default=[], metavar=('PHOTO', 'THERMAL_DIR'))
+    parser.add_argument('-c', '--csv', help='pairs in csv with column photo, thermal',
+        default=None)
+    parser.add_argument('-s', '--summary', help='path of the summary csv',
+        default='alignment_summary.csv')
+    parser.add_argument('-x', '--index', help='path of the index file of all transform matrices',
+        default='alignment_index.json')
+    parser.add_argument('--avg', help='number of thermal frames to average',
+        type=int, default=30)
+    parser.add_argument('--robust', help='average the sliding median of thermal frames',
+        action='store_true')
+    parser.add_argument('-w', '--workers', help='number of the worker processes',
+        type=int, default=os.cpu_count())
+    parser.add_argument('--min-score', help='flag the result which IoU score is lower than it',
+        type=float, default=SCORE_THRESHOLD)
+    parser.add_argument('--registry', help='json registry of the accepted matrix of each rig',
+        default=DEFAULT_REGISTRY)
+    parser.add_argument('--no-registry', help='neither use nor update the matrix registry',
+        action='store_true')
+    parser.add_argument('--rig', help='rig id of the registry key',
+        default=None)
+    parser.add_argument('--review', help='open manual mapping for the flagged pairs after batch',
+        action='store_true')
+    return parser
+
+def saved_dir(photo):
+    """the same directory as AutoMappingAction saves the transform matrix"""
+    return os.path.join(os.path.dirname(photo), os.path.basename(photo).split('.')[0])
+
+def read_pairs(csv_path):
+    root = os.path.dirname(os.path.abspath(csv_path))
+    with open(csv_path, newline='') as f:
+        return [(os.path.join(root, row['photo'].strip()), os.path.join(root, row['thermal'].strip()))
+                for row in csv.DictReader(f)]
+
+def check_transform(M, max_scale=5.0):
+    """return the reason if the transform matrix is degenerate, otherwise None"""
+    if M is None:
+        return 'no transform matrix'
+    if not np.isfinite(M).all():
+        return 'transform matrix is not finite'
+    det = np.linalg.det(M[:2, :2] / M[2, 2])
+    if det <= 0:
+        return 'transform matrix flips the image'
+    if not 1/max_scale**2 < det < max_scale**2:
+        return 'transform matrix scales by {:.2f}'.format(np.sqrt(det))
+    return None
+
+def align(photo, thermal, avg_nth_img, robust, min_score, registry_path=None, rig=None):
+    registry = MatrixRegistry(registry_path) if registry_path else None
+    alignment = AlignmentCore(photo, thermal, avg_nth_img=avg_nth_img, robust=robust,
+                              registry=registry, rig=rig)
+    result_img = alignment.run()
+    reason = check_transform(alignment.transform_matrix)
+    if result_img is None and reason is None:
+        reason = 'alignment failed'
+    if reason is None and alignment.score < min_score:
+        reason = 'low score {:.3f}'.format(alignment.score)
+
+    save_path = saved_dir(photo)
+    if not os.path.exists(save_path):
+        os.makedirs(save_path)
+    matrix_path, preview_path = '', ''
+    if alignment.transform_matrix is not None:
+        matrix_path = os.path.join(save_path, MATRIX_FILE)
+        save_matrix(
+            matrix_path, alignment.transform_matrix,
+            photo_size=alignment.photo_size, thermal_size=alignment.thermal_size,
+            method=alignment.method, score=alignment.score
+        )
+    if result_img is not None:
+        preview_path = os.path.join(save_path, 'alignment_preview.png')
+        cv2.imwrite(preview_path, result_img)
+
+    return {
+        'photo': photo,
+        'thermal': thermal,
+        'status': 'review' if reason else 'ok',
+        'reason': reason or '',
+        'method': alignment.method or '',
+        'score': round(alignment.score, 4),
+        'matrix': matrix_path,
+        'preview': preview_path,
+        'registry_key': alignment.registry_key
+    }
+
+def review(flagged, rig=None):
+    from src.actions.mapping_app import ManualMappingAction
+    for i, row in enumerate(flagged):
+        logging.info('({}/{}) Review {} - {}'.format(i+1, len(flagged), row['photo'], row['reason']))
+        manual_action = ManualMappingAction(row['photo'], row['thermal'], rig=rig)
+        manual_action.mainloop()
+
+def main(args):
+    pairs = [tuple(os.path.abspath(p) for p in pair) for pair in args.pair]
+    if args.csv:
+        pairs += read_pairs(args.csv)
+    if not pairs:
+        logging.error('No given pair, use --pair or --csv')
+        return
+
+    results = []
+    registry_path = None if args.no_registry else args.registry
+    start_time = time.time()
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = {executor.submit(align, photo, thermal, args.avg, args.robust, args.min_score,
+                                   registry_path, args.rig): (photo, thermal)
+                   for photo, thermal in pairs}
+        for i, future in enumerate(as_completed(futures)):
+            photo, thermal = futures[future]
+            try:
+                row = future.result()
+            except Exception as e:
+                logging.exception('Failed {}'.format(photo))
+                row = {'photo': photo, 'thermal': thermal, 'status': 'failed', 'reason': str(e),
+                       'method': '', 'score': 0.0, 'matrix': '', 'preview': ''}
+            results.append(row)
+            logging.info('({}/{}) {} {} score={} {}'.format(
+                i+1, len(pairs), row['status'], photo, row['score'], row['reason']))
+
+    time_spent = time.time() - start_time
+    results = sorted(results, key=lambda row: pairs.index((row['photo'], row['thermal'])))
+
+    # register the best accepted matrix of each rig once in the main process
+    if registry_path:
+        registry, accepted = MatrixRegistry(registry_path), {}
+        for row in results:
+            key = row.pop('registry_key', None)
+            if row['status'] == 'ok' and key and row['score'] > accepted.get(key, {'score': -1})['score']:
+                accepted[key] = row
+        for key, row in accepted.items():
+            M = load_matrix(row['matrix'])
+            registry.register(key, M, row['score'], row['method'])
+    for row in results:
+        row.pop('registry_key', None)
+    with open(args.summary, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['photo', 'thermal', 'status', 'reason', 'method', 'score', 'matrix', 'preview'])
+        writer.writeheader()
+        writer.writerows(results)
+
+    save_index(args.index, {saved_dir(row['photo']): load_record(row['matrix'])
+                            for row in results if row['matrix']})
+
+    flagged = [row for row in results if row['status'] != 'ok']
+    logging.info('Completed {} pairs ({} flagged) in {:.2f} sec, summary in {}'.format(
+        len(results), len(flagged), time_spent, args.summary))
+    if args.review and flagged:
+        review(flagged, args.rig)
+
+
+if __name__ == '__main__':
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s [ %(levelname)8s ] - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S',
+        stream=sys.stdout
+        )
+
+    parser = argparser()
+    main(parser.parse_args())
@@ -0,0 +1,101 @@
+import os
+import sys
+import csv
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+from src.actions.detector import TemplateDetector
+from src.support.batch import collect_images
+from src.support.calibration import (SCALE_BAR_MM, find_scale_bar, make_calibration,
+                                     metadata_path, update_metadata)
+
+
+def argparser():
+    parser = argparse.ArgumentParser(description='batch pixel-to-millimetre calibration by the scale bar')
+    parser.add_argument('-i', '--image', help='process input image, glob pattern or directory',
+        nargs='+', default=[])
+    parser.add_argument('-r', '--recursive', help='process all image in given directory',
+        nargs='+', default=[])
+    parser.add_argument('-t', '--template', help='template image of the scale bar label',
+        default=os.path.join('image', '10mm.png'))
+    parser.add_argument('--mm', help='length of the scale bar in mm',
+        type=float, default=SCALE_BAR_MM)
+    parser.add_argument('-s', '--summary', help='path of the summary csv',
+        default='calibration_summary.csv')
+    parser.add_argument('-w', '--workers', help='number of the worker processes',
+        type=int, default=os.cpu_count())
+    return parser
+
+def calibrate(img, template, bar_mm):
+    detector = TemplateDetector(template, img)
+    label_rect = detector.detect_template_pyramid(workers=1)
+    if label_rect is None:
+        raise ValueError('scale bar label not found')
+
+    h, w = detector.target_shape
+    x, y, _, _ = label_rect
+    bar_rect = find_scale_bar(label_rect, detector.detect_rectangle((0, y, w, h-y)))
+    if bar_rect is None:
+        raise ValueError('scale bar not found under the label')
+
+    calibration = make_calibration(label_rect, bar_rect, detector.score, template, bar_mm)
+    return update_metadata(metadata_path(img), calibration)
+
+def main(args):
+    imgs = collect_images(args.image, args.recursive)
+    imgs = [img for img in imgs if not os.path.splitext(img)[0].endswith('_floodfill')]
+    if not imgs:
+        logging.error('No given image, use --image or --recursive')
+        return
+
+    results = []
+    start_time = time.time()
+    # one thread per process, the throughput scales with the processes
+    with ProcessPoolExecutor(max_workers=max(1, args.workers),
+                             initializer=cv2.setNumThreads, initargs=(1,)) as executor:
+        futures = {executor.submit(calibrate, img, args.template, args.mm): img for img in imgs}
+        for i, future in enumerate(as_completed(futures)):
+            img = futures[future]
+            row = {'image': img, 'status': 'ok', 'reason': '', 'px_per_mm': '',
+                   'scale_bar': '', 'body_width_mm': ''}
+            try:
+                calibration = future.result()
+                row.update({
+                    'px_per_mm': calibration['px_per_mm'],
+                    'scale_bar': ' '.join(str(v) for v in calibration['scale_bar']),
+                    'body_width_mm': calibration['body_width_mm'] or ''
+                })
+            except Exception as e:
+                logging.exception('Failed {}'.format(img))
+                row.update({'status': 'failed', 'reason': str(e)})
+            results.append(row)
+            logging.info('({}/{}) {} {} px_per_mm={} {}'.format(
+                i+1, len(imgs), row['status'], img, row['px_per_mm'], row['reason']))
+
+    time_spent = time.time() - start_time
+    results = sorted(results, key=lambda row: imgs.index(row['image']))
+    with open(args.summary, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['image', 'status', 'reason', 'px_per_mm', 'scale_bar', 'body_width_mm'])
+        writer.writeheader()
+        writer.writerows(results)
+
+    failed = len([row for row in results if row['status'] != 'ok'])
+    logging.info('Completed {} images ({} failed) in {:.2f} sec, {:.2f} images/sec, summary in {}'.format(
+        len(results), failed, time_spent, len(results) / time_spent, args.summary))
+
+
+if __name__ == '__main__':
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s [ %(levelname)8s ] - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S',
+        stream=sys.stdout
+        )
+
+    parser = argparser()
+    main(parser.parse_args())
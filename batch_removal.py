@@ -0,0 +1,114 @@
+import os
+import sys
+import csv
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+from src.image.imcv import FLOODFILL_GRADIENT, ImageCV
+from src.support.batch import collect_images, is_up_to_date, save_params
+
+
+def argparser():
+    parser = argparse.ArgumentParser(description='batch background removal by floodfill')
+    parser.add_argument('-i', '--image', help='process input image, glob pattern or directory',
+        nargs='+', default=[])
+    parser.add_argument('-r', '--recursive', help='process all image in given directory',
+        nargs='+', default=[])
+    parser.add_argument('-c', '--csv', help='per-image overrides with column image, threshold, iter',
+        default=None)
+    parser.add_argument('--threshold', help='floodfill threshold',
+        type=float, default=0.85)
+    parser.add_argument('--iter', help='iteration of median blur',
+        type=int, default=5)
+    parser.add_argument('--gradient', help='gradient of the floodfill edge',
+        choices=FLOODFILL_GRADIENT, default='color')
+    parser.add_argument('--roi', help='only process the object region in original resolution',
+        action='store_true')
+    parser.add_argument('-w', '--workers', help='number of the worker processes',
+        type=int, default=os.cpu_count())
+    parser.add_argument('-f', '--force', help='overwrite the up-to-date output',
+        action='store_true')
+    return parser
+
+def saved_path(img):
+    return '{}_floodfill.jpg'.format(os.path.splitext(img)[0])
+
+def read_overrides(csv_path):
+    """map the absolute path or the filename to (threshold, iter)"""
+    overrides = {}
+    with open(csv_path, newline='') as f:
+        for row in csv.DictReader(f):
+            threshold = float(row['threshold']) if row.get('threshold') else None
+            iter_blur = int(row['iter']) if row.get('iter') else None
+            key = row['image'].strip()
+            if os.sep in key:
+                key = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(csv_path)), key))
+            overrides[key] = (threshold, iter_blur)
+    return overrides
+
+def removal_params(threshold, iter_blur, gradient, roi):
+    """the effective parameters of the output, a changed one makes the output out of date"""
+    return {'threshold': threshold, 'iter': iter_blur, 'gradient': gradient, 'roi': roi}
+
+def removal(img, threshold, iter_blur, gradient, roi):
+    image = cv2.imread(img, cv2.IMREAD_COLOR)
+    if image is None:
+        raise IOError('Cannot read {}'.format(img))
+    result = ImageCV.run_floodfill(image, threshold, iter_blur, gradient=gradient, roi=roi)
+    cv2.imwrite(saved_path(img), result)
+    save_params(saved_path(img), removal_params(threshold, iter_blur, gradient, roi))
+    return saved_path(img)
+
+def main(args):
+    imgs = collect_images(args.image, args.recursive)
+    imgs = [img for img in imgs if not os.path.splitext(img)[0].endswith('_floodfill')]
+    overrides = read_overrides(args.csv) if args.csv else {}
+
+    tasks = []
+    for img in imgs:
+        threshold, iter_blur = overrides.get(img, overrides.get(os.path.basename(img), (None, None)))
+        threshold = args.threshold if threshold is None else threshold
+        iter_blur = args.iter if iter_blur is None else iter_blur
+        params = removal_params(threshold, iter_blur, args.gradient, args.roi)
+        if not args.force and is_up_to_date(img, saved_path(img), params):
+            logging.info('Skip up-to-date {}'.format(saved_path(img)))
+            continue
+        tasks.append((img, threshold, iter_blur, args.gradient, args.roi))
+
+    logging.info('Process {} images, skip {} up-to-date images'.format(len(tasks), len(imgs)-len(tasks)))
+    if not tasks:
+        return
+
+    failed = 0
+    start_time = time.time()
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = {executor.submit(removal, *task): task for task in tasks}
+        for i, future in enumerate(as_completed(futures)):
+            img, threshold, iter_blur = futures[future][:3]
+            try:
+                logging.info('({}/{}) Saved {} with threshold={}, iter={}'.format(
+                    i+1, len(tasks), future.result(), threshold, iter_blur))
+            except Exception as e:
+                failed += 1
+                logging.exception('({}/{}) Failed {} - {}'.format(i+1, len(tasks), img, e))
+
+    time_spent = time.time() - start_time
+    logging.info('Completed {} images ({} failed) in {:.2f} sec, {:.2f} images/sec'.format(
+        len(tasks), failed, time_spent, len(tasks) / time_spent))
+
+
+if __name__ == '__main__':
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s [ %(levelname)8s ] - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S',
+        stream=sys.stdout
+        )
+
+    parser = argparser()
+    main(parser.parse_args())
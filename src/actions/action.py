@@ -35,6 +35,7 @@ class MothPreprocessAction(PreprocessKeyboard, PreprocessMouse):
         self.root.bind(tkconfig.KEY_SPACE, self.save_display_image)
 
         # widget default binding
+        self.scale_iter.bind(tkconfig.MOUSE_MOTION, self.render_integer_value)
         self._sync_floodfill_option()
 
     @property
@@ -45,10 +46,8 @@ class MothPreprocessAction(PreprocessKeyboard, PreprocessMouse):
     def meta_floodfill_iter(self):
         return int(self.scale_iter.get())
 
-    # sync and detect whether value changes to re-render the floodfill
+    # bind the re-render of floodfill by state
     def _sync_floodfill_option(self):
-        self.scale_iter.bind(tkconfig.MOUSE_MOTION, self.render_integer_value)
-
         if 'edit' in self.root_state:
             self.scale_threshold.bind(tkconfig.MOUSE_RELEASE_LEFT, self.render_display)
             self.scale_iter.bind(tkconfig.MOUSE_RELEASE_LEFT, self.render_display)
@@ -56,7 +55,10 @@ class MothPreprocessAction(PreprocessKeyboard, PreprocessMouse):
             self.scale_threshold.unbind(tkconfig.MOUSE_RELEASE_LEFT)
             self.scale_iter.unbind(tkconfig.MOUSE_RELEASE_LEFT)
 
-        self.root.after(10, self._sync_floodfill_option)
+    # render all widgets and the binding by current state
+    def sync(self):
+        self._sync_floodfill_option()
+        super().sync()
 
 
 class MothGraphcutAction(GraphcutKeyboard, GraphcutMouse):
@@ -67,12 +69,13 @@ class MothGraphcutAction(GraphcutKeyboard, GraphcutMouse):
         self.root.bind(tkconfig.KEY_UP, self.switch_to_previous_image)
         self.root.bind(tkconfig.KEY_DOWN, self.switch_to_next_image)
         self.root.bind(tkconfig.KEY_ENTER, self.enter_edit_mode)
-        self._sync_panel_mouse_event()
 
-        # default binding: detector
+        # default binding: detector, re-render when the option changes
         self.checkbtn_manual_detect.configure(command=self._invoke_manual_detect)
         self.checkbtn_template_detect.configure(command=self._invoke_template_detect)
-        self._sync_detection()
+        self.val_manual_detect.trace_add('write', lambda *args: self.request_sync())
+        self.val_template_detect.trace_add('write', lambda *args: self.request_sync())
+        self.request_sync()
 
     # unique the element in list
     def _unique(self, l):
@@ -114,7 +117,12 @@ class MothGraphcutAction(GraphcutKeyboard, GraphcutMouse):
                 self.panel_image_state.remove(STATE_MANUAL_DETECT)
 
             target_h, target_w, _ = self.image_panel.shape
-            x, y, w, h = self.detector.detect_template()
+            rect = self.detector.detect_template_pyramid()
+            if rect is None:
+                LOGGER.warning('Cannot detect the template in {}'.format(self.current_image_path))
+                self.val_template_detect.set(False)
+                return
+            x, y, w, h = rect
             self.image_panel[y:y+h, x:x+w, :] = 255
 
             possible_rects = self.detector.detect_rectangle((0, y, target_w, target_h-y))
@@ -157,8 +165,6 @@ class MothGraphcutAction(GraphcutKeyboard, GraphcutMouse):
                 self.panel_image_state
             ))
 
-        self.root.after(100, self._sync_detection)
-
     # determine the mouse event in each state
     def _sync_panel_mouse_event(self):
         # edit mode
@@ -167,8 +173,14 @@ class MothGraphcutAction(GraphcutKeyboard, GraphcutMouse):
             self.root.bind(tkconfig.KEY_RIGHT, self.move_symmetric_to_right)
             self.label_panel_image.bind(tkconfig.MOUSE_MOTION, self.draw_symmetric_line)
 
-        self.root_state = self._unique(self.root_state)
-        self.root.after(100, self._sync_panel_mouse_event)
+        if len(set(self.root_state)) != len(self.root_state):
+            self.root_state = self._unique(self.root_state)
+
+    # detect and bind before rendering so that the panel shows the latest result
+    def sync(self):
+        self._sync_detection()
+        self._sync_panel_mouse_event()
+        super().sync()
 
 if __name__ == '__main__':
     """testing"""
@@ -4,17 +4,47 @@ import logging
 import numpy as np
 
 import cv2
-from skimage import measure
+
+from src.image.imcv import ImageCV
+from src.image.imnp import ImageNP
+from src.support.prefetch import prefetch_map
 
 LOGGER = logging.getLogger(__name__)
+SCORE_THRESHOLD = 0.5
+ACCEPT_THRESHOLD = 0.8
+
+# diagonal direction of lt, lb, rt, rb in columns
+DIAGONAL_WEIGHT = np.array([[-1, -1, 1, 1], [-1, 1, -1, 1]])
 
 class AlignmentCore(object):
-    def __init__(self, img_path, heat_dirpath, avg_nth_img=30):
+    """
+    Argument
+        @img_path       original image path
+        @heat_dirpath   directory of thermal frames
+        @avg_nth_img    number of thermal frames to average
+        @robust         average the sliding median of the last ring_size frames for noisy sequences
+        @ring_size      number of frames in the ring buffer of sliding median
+        @registry       MatrixRegistry which offers the last accepted matrix of the same rig
+        @rig            rig id of the registry key
+
+    After run(), score is the IoU of the warped thermal silhouette and the original mask,
+    method is the strategy of the best transform matrix among registry, ecc, max, min and ransac
+    """
+    def __init__(self, img_path, heat_dirpath, avg_nth_img=30, robust=False, ring_size=5,
+                 registry=None, rig=None):
         self.img_path = img_path
         self.heat_dirpath = heat_dirpath
         self.avg_nth_img = avg_nth_img
+        self.robust = robust
+        self.ring_size = ring_size
+        self.registry = registry
+        self.rig = rig
+        self.registry_key = None
         self.transform_matrix = None
         self.result_img = None
+        self.method = None
+        self.score = 0.0
+        self.scores = {}
 
     # handle the image path and reading
     def _load_image(self):
@@ -27,6 +57,10 @@ class AlignmentCore(object):
         self.original_img = cv2.imread(self.img_path)
         self.heat_img = cv2.imread(heat_img, cv2.IMREAD_GRAYSCALE)
         self.mask_img = cv2.imread(mask_img, cv2.IMREAD_GRAYSCALE)
+        self.photo_size = self.original_img.shape[:2][::-1]
+        self.thermal_size = self.heat_img.shape[:2][::-1]
+        if self.registry is not None:
+            self.registry_key = self.registry.key(self.original_img.shape, self.heat_img.shape, self.rig)
 
     # preprocess the original, heat, and mask image
     def _preprocess_image(self):
@@ -34,16 +68,44 @@ class AlignmentCore(object):
         self.original_img = cv2.resize(self.original_img, (self.heat_img.shape[1], self.heat_img.shape[0]))
 
         # preprocess heat image to get the transform matrix
-        self.heat_img = np.zeros((self.heat_img.shape[0], self.heat_img.shape[1], self.avg_nth_img))
-        self.heat_img = self.heat_img.astype('float32')
-        self.heat_img = self._avg_sample_image(self.heat_img, self.heat_path[1:self.avg_nth_img+1])
-        self.heat_img = np.sum(self.heat_img, axis=2)
+        sample_path = self.heat_path[1:self.avg_nth_img+1]
+        if self.robust:
+            self.heat_img = self._median_sample_image(sample_path, self.ring_size)
+        else:
+            self.heat_img = self._avg_sample_image(sample_path)
         self.heat_img = self._normalize_image(self.heat_img)
 
-    # averaging n images
-    def _avg_sample_image(self, base, img_path):
-        for i, imfile in enumerate(img_path):
-            base[:, :, i-1] = cv2.imread(imfile, cv2.IMREAD_GRAYSCALE).astype('float32')
+    # read the thermal frames in background
+    def _read_sample_image(self, img_path):
+        def read(imfile):
+            img = cv2.imread(imfile, cv2.IMREAD_GRAYSCALE)
+            if img is None:
+                raise IOError('Cannot read {}'.format(imfile))
+            return img
+        return prefetch_map(read, img_path)
+
+    # summing n images into one float64 buffer
+    def _avg_sample_image(self, img_path):
+        base = None
+        for img in self._read_sample_image(img_path):
+            if base is None:
+                base = np.zeros(img.shape, dtype='float64')
+            cv2.accumulate(img, base)
+        return base
+
+    # summing the sliding median of the last ring_size images at every new image
+    def _median_sample_image(self, img_path, ring_size=5):
+        base, ring, count = None, None, 0
+        for img in self._read_sample_image(img_path):
+            if base is None:
+                base = np.zeros(img.shape, dtype='float64')
+                ring = np.empty((ring_size,) + img.shape, dtype=img.dtype)
+            ring[count % ring_size] = img
+            count += 1
+            if count >= ring_size:
+                cv2.accumulate(np.median(ring, axis=0), base)
+        if 0 < count < ring_size:
+            cv2.accumulate(np.median(ring[:count], axis=0), base)
         return base
 
     # normalize each pixel
@@ -54,94 +116,148 @@ class AlignmentCore(object):
         img = img.astype('uint8')
         return img
 
-    # get contour centers
-    def _get_contour_centers(self, img):
-        _, contours, _ = cv2.findContours(img.copy(), cv2.RETR_CCOMP, cv2.CHAIN_APPROX_TC89_L1)
-        centres = []
-
-        for i, cnt in enumerate(contours):
-            moments = cv2.moments(cnt)
-            if moments['m00'] == 0:
-                continue
+    # otsu mask of the object, reverse if the first row is mostly foreground
+    def _get_otsu_mask(self, gray):
+        ret, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY+cv2.THRESH_OTSU)
+        if mask[0, :].sum() > 255*5:
+            mask = cv2.bitwise_not(mask)
+        return mask
 
-            moment = (int(moments['m10']/moments['m00']), int(moments['m01']/moments['m00']))
-            centres.append(moment)
+    # IoU of the warped thermal silhouette and the original mask
+    def _score_transform_matrix(self, M, orig_mask, heat_mask):
+        try:
+            warp_mask = cv2.warpPerspective(
+                heat_mask, M, orig_mask.shape[::-1], flags=cv2.INTER_NEAREST
+            ) > 0
+        except cv2.error:
+            return 0.0
+        orig_mask = orig_mask > 0
+        union = np.count_nonzero(warp_mask | orig_mask)
+        return np.count_nonzero(warp_mask & orig_mask) / union if union else 0.0
+
+    # RANSAC over the nearest pairs of all centers under the initial transform matrix
+    def _find_ransac_matrix(self, heat_centers, orig_centers, M, max_distance=10.0):
+        heat_centers = np.array(heat_centers, dtype='float32').reshape(-1, 1, 2)
+        orig_centers = np.array(orig_centers, dtype='float32').reshape(-1, 2)
+        if len(heat_centers) < 4 or len(orig_centers) < 4:
+            return None
+        warp_centers = cv2.perspectiveTransform(heat_centers, M).reshape(-1, 2)
+        distance = np.linalg.norm(warp_centers[:, np.newaxis] - orig_centers[np.newaxis], axis=2)
+        nearest = distance.argmin(axis=1)
+        matched = distance[np.arange(len(nearest)), nearest] < max_distance
+        if np.count_nonzero(matched) < 4:
+            return None
+        ransac_M, status = cv2.findHomography(
+            heat_centers.reshape(-1, 2)[matched], orig_centers[nearest[matched]], cv2.RANSAC, 3.0
+        )
+        return ransac_M
+
+    # refine the initial transform matrix by ECC on the downsampled silhouettes
+    def _find_ecc_matrix(self, M, orig_mask, heat_mask, max_width=160, iteration=50, eps=1e-4):
+        scale = min(1.0, max_width / orig_mask.shape[1])
+        S = np.diag([scale, scale, 1.0])
+        size = (max(1, int(orig_mask.shape[1]*scale)), max(1, int(orig_mask.shape[0]*scale)))
+        orig_small = cv2.GaussianBlur(cv2.resize(orig_mask, size, interpolation=cv2.INTER_AREA), (5, 5), 0)
+        heat_small = cv2.GaussianBlur(cv2.resize(heat_mask, size, interpolation=cv2.INTER_AREA), (5, 5), 0)
+
+        # ECC warp maps the template (original) to the input (thermal), the inverse of M
+        warp = (S @ np.linalg.inv(M) @ np.linalg.inv(S)).astype('float32')
+        criteria = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, iteration, eps)
+        try:
+            _, warp = cv2.findTransformECC(
+                orig_small.astype('float32'), heat_small.astype('float32'),
+                warp, cv2.MOTION_HOMOGRAPHY, criteria, None, 5
+            )
+        except cv2.error as e:
+            LOGGER.debug('ECC does not converge - {}'.format(e))
+            return None
+        ecc_M = np.linalg.inv(S) @ np.linalg.inv(warp.astype('float64')) @ S
+        return ecc_M / ecc_M[2, 2]
 
-        return centres
+    # get contour centers, the moments of all contours in one pass as cv2.moments
+    def _get_contour_centers(self, img):
+        _, contours, _ = cv2.findContours(img.copy(), cv2.RETR_CCOMP, cv2.CHAIN_APPROX_TC89_L1)
+        if not contours:
+            return []
+
+        # shoelace terms of each edge (previous point, point) along every contour
+        lengths = np.array([len(cnt) for cnt in contours])
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        points = np.concatenate(contours).reshape(-1, 2).astype('float64')
+        prev = np.arange(len(points)) - 1
+        prev[starts] = starts + lengths - 1
+        x, y = points[:, 0], points[:, 1]
+        x_prev, y_prev = x[prev], y[prev]
+        dxy = x_prev*y - x*y_prev
+
+        # the sums of integer terms are exact, the same as cv2.moments
+        a00 = np.add.reduceat(dxy, starts)
+        a10 = np.add.reduceat(dxy*(x_prev + x), starts)
+        a01 = np.add.reduceat(dxy*(y_prev + y), starts)
+        sign = np.where(a00 > 0, 1.0, -1.0)
+        m00, m10, m01 = sign*a00*0.5, sign*a10*(1.0/6), sign*a01*(1.0/6)
+
+        # skip the degenerate contour (m00 == 0) and keep the contour order for the ties
+        valid = m00 != 0
+        centres = zip(
+            (m10[valid]/m00[valid]).astype('int64').tolist(),
+            (m01[valid]/m00[valid]).astype('int64').tolist()
+        )
+        return list(centres)
 
     # get nearest centers
     def _get_nearest_centers(self, img, neighbors=8):
-        labels = measure.label(img, neighbors=neighbors, background=0)
-        centres = []
-
-        for label in np.unique(labels):
-            if label == 0:
-                 continue
+        count, labels, stats, _ = ImageCV.connected_component_stats(img, connectivity=neighbors)
 
-            label_points = np.where(labels == label)
-
-            if len(label_points[0]) < 2:
-                continue
-
-            y_center = (label_points[0].min()+label_points[0].max()) // 2
-            x_center = (label_points[1].min()+label_points[1].max()) // 2
-            center = (x_center ,y_center)
-            centres.append(center)
+        # bounding box center of each component which has more than one point
+        stats = stats[1:]
+        stats = stats[stats[:, cv2.CC_STAT_AREA] >= 2]
+        x, w = stats[:, cv2.CC_STAT_LEFT], stats[:, cv2.CC_STAT_WIDTH]
+        y, h = stats[:, cv2.CC_STAT_TOP], stats[:, cv2.CC_STAT_HEIGHT]
+        x_center = (2*x + w - 1) // 2
+        y_center = (2*y + h - 1) // 2
+        centres = list(zip(x_center.tolist(), y_center.tolist()))
 
         return centres
 
-    # find max point
+    # find the point of max diagonal score (lt, lb, rt, rb)
     def _find_max_point(self, points):
-        lt, lb, rt, rb = {}, {}, {}, {}
-
-        for point in points:
-            lt[point] = (-point[0]) + (-point[1])
-            lb[point] = (-point[0]) + (point[1])
-            rt[point] = (point[0]) + (-point[1])
-            rb[point] = (point[0]) + (point[1])
-
-        lt = max(lt, key=lt.get)
-        lb = max(lb, key=lb.get)
-        rt = max(rt, key=rt.get)
-        rb = max(rb, key=rb.get)
+        points = np.asarray(points).reshape(-1, 2)
+        if not len(points):
+            raise ValueError('No given point')
+        scores = points @ DIAGONAL_WEIGHT
+        return points[scores.argmax(axis=0)]
 
-        return np.array([lt, lb, rt, rb])
-
-    # find min point
+    # find the point of min diagonal score (lt, lb, rt, rb) in each quadrant around the center
     def _find_min_point(self, points, center):
-        lt, lb, rt, rb = {}, {}, {}, {}
-
-        for point in points:
-            if point[0] < center[0] and point[1] < center[1]:
-                lt[point] = (-point[0]) + (-point[1])
-            elif point[0] < center[0] and point[1] >= center[1]:
-                lb[point] = (-point[0]) + (point[1])
-            elif point[0] >= center[0] and point[1] < center[1]:
-                rt[point] = (point[0]) + (-point[1])
-            elif point[0] >= center[0] and point[1] >= center[1]:
-                rb[point] = (point[0]) + (point[1])
-
-        lt = min(lt, key=lt.get)
-        lb = min(lb, key=lb.get)
-        rt = min(rt, key=rt.get)
-        rb = min(rb, key=rb.get)
-
-        return np.array([lt, lb, rt, rb])
-
-    # find transform matrix
-    def _find_transform_matrix(self, orig_img, heat_img, mask_img):
-
-        orig = orig_img.copy()
+        points = np.asarray(points).reshape(-1, 2)
+        left, top = points[:, 0] < center[0], points[:, 1] < center[1]
+        quadrant = np.stack((left & top, left & ~top, ~left & top, ~left & ~top), axis=1)
+        if not quadrant.any(axis=0).all():
+            raise ValueError('No point in some quadrant around {}'.format(center))
+        scores = np.where(quadrant, points @ DIAGONAL_WEIGHT, np.inf)
+        return points[scores.argmin(axis=0)]
+
+    # registry matrix and its ECC refinement as the candidates
+    def _find_registry_candidates(self, orig_mask, heat_mask):
+        candidates = {}
+        if self.registry is None or self.registry_key is None:
+            return candidates
+        M = self.registry.get(self.registry_key)
+        if M is None:
+            return candidates
+
+        candidates['registry'] = M
+        ecc_M = self._find_ecc_matrix(M, orig_mask, heat_mask)
+        if ecc_M is not None:
+            candidates['ecc'] = ecc_M
+        return candidates
+
+    # candidates from the contour centers, also return the centers for RANSAC
+    def _find_contour_candidates(self, orig, heat_img, mask_img):
         heat = heat_img.copy()
         mask = mask_img.copy()
 
-        # original image
-        orig = cv2.cvtColor(orig, cv2.COLOR_BGR2HSV)[:, :, 2]
-        ret, orig = cv2.threshold(orig, 0, 255, cv2.THRESH_BINARY+cv2.THRESH_OTSU)
-
-        if orig[0,:].sum() > 255*5:
-            orig = cv2.bitwise_not(orig)
-
         # mask
         ret, mask = cv2.threshold(mask,0,255,cv2.THRESH_BINARY+cv2.THRESH_OTSU)
         mask_points = np.where(mask == 255)
@@ -150,19 +266,15 @@ class AlignmentCore(object):
 
         if mask[0, :].sum() > 255*15:
             heat = mask_img.copy()
-            threshold = np.sort(heat, axis=None)[int(heat.size*0.01)]
+            threshold = ImageNP.sorted_value(heat, 0.01)
             ret, heat = cv2.threshold(heat, threshold, 255, cv2.THRESH_BINARY)
 
             # for background colour mixed black and white
             heat = cv2.bitwise_not(heat)
             heat = cv2.medianBlur(heat, 3, 10)
-            orig_centers = self._get_contour_centers(orig)
-            orig_points = self._find_max_point(orig_centers)
-            heat_centers = self._get_nearest_centers(heat)
-            heat_points = self._find_max_point(heat_centers)
 
         else:
-            threshold = np.sort(heat, axis=None)[int(heat.size*0.04)]
+            threshold = ImageNP.sorted_value(heat, 0.04)
             ret, heat = cv2.threshold(heat, threshold, 255, cv2.THRESH_BINARY)
 
             # for background colour mixed black and white
@@ -172,14 +284,79 @@ class AlignmentCore(object):
             heat[mask_y[2]-40:mask_y[2]+40, :] = 0
 
             heat = cv2.medianBlur(heat,3,10)
-            orig_centers = self._get_contour_centers(orig)
-            orig_points = self._find_max_point(orig_centers)
-            heat_centers = self._get_nearest_centers(heat)
-            heat_points = self._find_min_point(heat_centers, (mask_x[2], mask_y[2]))
 
-        M, status = cv2.findHomography(heat_points, orig_points)
+        orig_centers = self._get_contour_centers(orig)
+        orig_points = self._find_max_point(orig_centers)
+        heat_centers = self._get_nearest_centers(heat)
+
+        # candidates of each strategy
+        candidates = {}
+        strategies = (
+            ('max', lambda: self._find_max_point(heat_centers)),
+            ('min', lambda: self._find_min_point(heat_centers, (mask_x[2], mask_y[2])))
+        )
+        for method, find_points in strategies:
+            try:
+                M, status = cv2.findHomography(find_points(), orig_points)
+                if M is not None:
+                    candidates[method] = M
+            except (ValueError, cv2.error) as e:
+                LOGGER.debug('Cannot find transform matrix by {} - {}'.format(method, e))
+
+        return candidates, orig_centers, heat_centers
+
+    # find transform matrix
+    def _find_transform_matrix(self, orig_img, heat_img, mask_img):
 
-        return M
+        # original image
+        orig = cv2.cvtColor(orig_img, cv2.COLOR_BGR2HSV)[:, :, 2]
+        orig = self._get_otsu_mask(orig)
+        orig_mask = orig
+        heat_mask = self._get_otsu_mask(heat_img)
+
+        # fast path: accept the refined registry matrix of the same rig
+        candidates = self._find_registry_candidates(orig_mask, heat_mask)
+        self.scores = {method: self._score_transform_matrix(M, orig_mask, heat_mask)
+                       for method, M in candidates.items()}
+        if self.scores and max(self.scores.values()) >= ACCEPT_THRESHOLD:
+            self.method = max(self.scores, key=self.scores.get)
+            self.score = self.scores[self.method]
+            LOGGER.info('Transform matrix by {}, scores {}'.format(self.method, self.scores))
+            return candidates[self.method]
+
+        try:
+            contour_candidates, orig_centers, heat_centers = self._find_contour_candidates(
+                orig, heat_img, mask_img
+            )
+        except (ValueError, cv2.error) as e:
+            if not candidates:
+                raise
+            LOGGER.warning('Cannot find contour candidates - {}'.format(e))
+            contour_candidates, orig_centers, heat_centers = {}, [], []
+
+        # score by the silhouette overlapping, refine the best one by RANSAC
+        self.scores.update({method: self._score_transform_matrix(M, orig_mask, heat_mask)
+                            for method, M in contour_candidates.items()})
+        candidates.update(contour_candidates)
+        if self.scores:
+            initial_M = candidates[max(self.scores, key=self.scores.get)]
+            ransac_M = self._find_ransac_matrix(heat_centers, orig_centers, initial_M)
+            if ransac_M is not None:
+                candidates['ransac'] = ransac_M
+                self.scores['ransac'] = self._score_transform_matrix(ransac_M, orig_mask, heat_mask)
+
+        if not candidates:
+            raise ValueError('No transform matrix candidate')
+        self.method = max(self.scores, key=self.scores.get)
+        self.score = self.scores[self.method]
+        LOGGER.info('Transform matrix by {}, scores {}'.format(self.method, self.scores))
+
+        return candidates[self.method]
+
+    # store the accepted transform matrix in the registry
+    def register(self):
+        if self.registry is not None and self.registry_key is not None and self.transform_matrix is not None:
+            self.registry.register(self.registry_key, self.transform_matrix, self.score, self.method)
 
     def run(self):
         self._load_image()
@@ -199,15 +376,12 @@ class AlignmentCore(object):
 
             # get mask to check the difference of thermal and original image
             self.mask_img = cv2.cvtColor(self.original_img, cv2.COLOR_BGR2HSV)[:, :, 2]
-            ret, self.mask_img = cv2.threshold(self.mask_img, 0, 255, cv2.THRESH_BINARY+cv2.THRESH_OTSU)
-            if self.mask_img[0, :].sum() > 255*5:
-                self.mask_img[self.mask_img == 255] = 100
-                self.mask_img[self.mask_img == 0] = 255
-                self.mask_img[self.mask_img == 100] = 0
+            self.mask_img = self._get_otsu_mask(self.mask_img)
             self.mask_img = self.mask_img.astype('bool')
             self.result_img[self.mask_img] = 0
 
         except Exception as e:
             LOGGER.exception('Cannot get the transform matrix')
+            self.method, self.score = None, 0.0
 
         return self.result_img
@@ -13,6 +13,10 @@ from PIL.ImageTk import PhotoImage
 import cv2
 from src.image.colormap import ColorMap
 from src.image.imnp import ImageNP
+from src.image.warp import InverseWarp
+from src.support.matrix_io import (MATRIX_FILE, find_matrix_path, is_index,
+                                   load_index, load_matrix, lookup_index,
+                                   record_to_matrix)
 from src.support.msg_box import MessageBox
 from src.support.tkconvert import TkConverter
 from src.view.component_app import (EntryThermalComponentViewer,
@@ -43,6 +47,8 @@ class EntryThermalComponentAction(EntryThermalComponentViewer):
         self.btn_contour_meta_upload.config(command=self._load_contour_meta)
         self.btn_preview.config(command=self._preview)
         self.btn_convert.config(command=self._convert)
+        self.val_filetype.trace_add('write', lambda *args: self._sync_generate_save_path())
+        self.val_visual.trace_add('write', lambda *args: self._sync_generate_visual_path())
         self._sync_generate_save_path()
         self._sync_generate_visual_path()
 
@@ -58,6 +64,8 @@ class EntryThermalComponentAction(EntryThermalComponentViewer):
             frame_count = len(os.listdir(self._thermal_dir_path))
             self.label_thermal_path.config(text=self._thermal_dir_path)
             self.label_convert_state.config(text=u'共 {} 份檔案 - 準備中'.format(frame_count))
+            self._sync_generate_save_path()
+            self._sync_generate_visual_path()
 
     # load original image path
     def _load_component_img(self):
@@ -85,14 +93,23 @@ class EntryThermalComponentAction(EntryThermalComponentViewer):
 
             # try to generate transform matrix path
             if self._transform_matrix_path is None or not self._transform_matrix_path:
-                self._transform_matrix_path = os.path.join(self._component_dir_path.split('.')[0], 'transform_matrix.dat')
-                if os.path.exists(self._transform_matrix_path):
+                matrix_dir = self._component_dir_path.split('.')[0]
+                self._transform_matrix_path = find_matrix_path(matrix_dir)
+                if self._transform_matrix_path is not None:
                     LOGGER.info('Transform matrix file - {}'.format(self._transform_matrix_path))
-                    self.label_transform_matrix_path.config(text=self._transform_matrix_path)
-                    self._transform_matrix = np.fromfile(self._transform_matrix_path)
-                    self._transform_matrix = self._transform_matrix.reshape(3, 3)
+                    try:
+                        self._transform_matrix = self._read_transform_matrix(self._transform_matrix_path)
+                        self.label_transform_matrix_path.config(text=self._transform_matrix_path)
+                    except (IOError, ValueError, KeyError, TypeError) as e:
+                        LOGGER.exception(e)
+                        self._transform_matrix = None
+                        self._transform_matrix_path = None
+                        Mbox = MessageBox()
+                        Mbox.alert(string=u'無法正確讀取轉換矩陣, 請手動選擇')
+                        self._load_transform_matrix()
                 else:
-                    LOGGER.warning('Transform matrix file {} does not exist'.format(self._transform_matrix_path))
+                    LOGGER.warning('Transform matrix file {} does not exist'.format(
+                        os.path.join(matrix_dir, MATRIX_FILE)))
 
             # try to generate other necessary data path
             if self._contour_path is None or not self._contour_path:
@@ -105,19 +122,35 @@ class EntryThermalComponentAction(EntryThermalComponentViewer):
                 else:
                     LOGGER.warning('Contour meta {} does not exist'.foramt(self._contour_path))
 
+    # read the matrix record, legacy .dat or look up the index by the component directory
+    def _read_transform_matrix(self, path):
+        if is_index(path):
+            if not self._component_dir_path:
+                raise ValueError('Load the component directory before the matrix index')
+            record = lookup_index(load_index(path), self._component_dir_path)
+            if record is None:
+                raise ValueError('No matrix of {} in the index'.format(self._component_dir_path))
+            return record_to_matrix(record)
+        return load_matrix(path)
+
     # load transform matrix path
     def _load_transform_matrix(self):
         self._transform_matrix_path = askopenfilename(
             initialdir=os.path.abspath(os.path.join(__FILE__, '../../../')),
             title=u'選擇轉換矩陣路徑',
-            filetypes=(('Numpy array', '*.dat'),)
+            filetypes=(('Transform matrix', '*.json'), ('Numpy array', '*.dat'))
         )
 
         if self._transform_matrix_path:
             LOGGER.info('Transform matrix file - {}'.format(self._transform_matrix_path))
-            self.label_transform_matrix_path.config(text=self._transform_matrix_path)
-            self._transform_matrix = np.fromfile(self._transform_matrix_path)
-            self._transform_matrix = self._transform_matrix.reshape(3, 3)
+            try:
+                self._transform_matrix = self._read_transform_matrix(self._transform_matrix_path)
+                self.label_transform_matrix_path.config(text=self._transform_matrix_path)
+            except (IOError, ValueError, KeyError, TypeError) as e:
+                LOGGER.exception(e)
+                self._transform_matrix = None
+                Mbox = MessageBox()
+                Mbox.alert(string=u'無法正確讀取轉換矩陣')
 
     # load contour metadata path
     def _load_contour_meta(self):
@@ -139,8 +172,6 @@ class EntryThermalComponentAction(EntryThermalComponentViewer):
             self._output_dir_path = '{}_warp_{}'.format(self._thermal_dir_path, self.val_filetype.get())
             self.label_output_path.config(text=self._output_dir_path)
 
-        self.label_output_path.after(10, self._sync_generate_save_path)
-
     # sync visual path
     def _sync_generate_visual_path(self):
         if self._thermal_dir_path and self.val_visual.get() == 'y':
@@ -150,8 +181,6 @@ class EntryThermalComponentAction(EntryThermalComponentViewer):
             self._output_visual_path = None
             self.label_visual_path.config(text='N/A')
 
-        self.label_visual_path.after(10, self._sync_generate_visual_path)
-
     # check if all necessary data is prepared
     def _check_data(self):
         if self._thermal_dir_path is None or not self._thermal_dir_path:
@@ -178,7 +207,7 @@ class EntryThermalComponentAction(EntryThermalComponentViewer):
             return False
         elif (
             self._contour_meta is None or
-            sorted(set(self._contour_meta.keys())) != sorted(['fl', 'fr', 'bl', 'br', 'body', 'image']) or
+            not set(['fl', 'fr', 'bl', 'br', 'body', 'image']).issubset(self._contour_meta.keys()) or
             'cnts' not in self._contour_meta['fl'] or
             'cnts' not in self._contour_meta['fr'] or
             'cnts' not in self._contour_meta['bl'] or
@@ -247,6 +276,7 @@ class EntryThermalComponentAction(EntryThermalComponentViewer):
         if self._check_data():
             is_output_visual = True if self.val_visual.get() == 'y' else False
             output_file_format = self.val_filetype.get()
+            is_inverse_warp = self.val_warp_mode.get() == 'inverse'
             thermal_frames = [os.path.join(self._thermal_dir_path, f) for f in os.listdir(self._thermal_dir_path)]
             thermal_frames = sorted(thermal_frames, key=lambda x: int(x.split(os.sep)[-1].split('.')[0].split('_')[-1]))
             component_cnts = {
@@ -270,18 +300,30 @@ class EntryThermalComponentAction(EntryThermalComponentViewer):
                 ret, mask = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY)
                 component_mask[part] = mask
 
+            # map each part mask back to thermal space once, then warp a frame by a gather
+            inverse_warp = {}
+            if is_inverse_warp:
+                inverse_warp = {
+                    part: InverseWarp(self._transform_matrix, mask, _.shape)
+                    for part, mask in component_mask.items()
+                }
+
             # process each frame
             for idx, frame in enumerate(thermal_frames):
                 frame_data = np.loadtxt(open(frame, 'rb'), delimiter=',', skiprows=1)
-                thermal_map = ColorMap(frame_data)
-                thermal_img = thermal_map.transform_to_rgb()
+                if is_output_visual:
+                    thermal_map = ColorMap(frame_data)
+                    thermal_img = thermal_map.transform_to_rgb()
 
                 # process each component
                 for part, cnt in component_cnts.items():
 
                     # save visual path
                     if is_output_visual:
-                        warp_thermal = cv2.warpPerspective(thermal_img, self._transform_matrix, thermal_img.shape[:2][::-1])
+                        if is_inverse_warp:
+                            warp_thermal = inverse_warp[part].warp(thermal_img)
+                        else:
+                            warp_thermal = cv2.warpPerspective(thermal_img, self._transform_matrix, thermal_img.shape[:2][::-1])
                         warp_thermal = warp_thermal.astype('float32')
                         warp_thermal = cv2.cvtColor(warp_thermal, cv2.COLOR_RGB2BGR)
                         warp_thermal[np.where(component_mask[part] == 0)] = 0
@@ -299,8 +341,11 @@ class EntryThermalComponentAction(EntryThermalComponentViewer):
                         os.makedirs(savedir)
 
                     # warp thermal frame > mask
-                    warp_component = cv2.warpPerspective(frame_data, self._transform_matrix, frame_data.shape[:2][::-1])
-                    warp_component[np.where(component_mask[part] == 0)] = 0
+                    if is_inverse_warp:
+                        warp_component = inverse_warp[part].warp(frame_data)
+                    else:
+                        warp_component = cv2.warpPerspective(frame_data, self._transform_matrix, frame_data.shape[:2][::-1])
+                        warp_component[np.where(component_mask[part] == 0)] = 0
 
                     # save
                     saveframe = os.path.join(savedir, frame.split(os.sep)[-1].split('.')[0])
@@ -1,5 +1,9 @@
 import logging
+import os
 import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 import cv2
 import numpy as np
@@ -11,21 +15,92 @@ from src.support.profiling import func_profiling
 LOGGER = logging.getLogger(__name__)
 DETECT_METHOD = [cv2.TM_CCOEFF, cv2.TM_CCOEFF_NORMED, cv2.TM_CCORR,\
                  cv2.TM_CCORR_NORMED, cv2.TM_SQDIFF,cv2.TM_SQDIFF_NORMED]
+NORMED_METHOD = [cv2.TM_CCOEFF_NORMED, cv2.TM_CCORR_NORMED, cv2.TM_SQDIFF_NORMED]
+
+# detection result of each target, keyed by (target path, mtime)
+DETECTION_CACHE_SIZE = 1024
+_detection_cache = OrderedDict()
+
+@lru_cache(maxsize=8)
+def template_edges(template, mtime, downsample=2):
+    """
+    gray, edge and downsampled edge of the template, computed once per process
+    and reused by all detectors, mtime is part of the key to notice the modified file
+    """
+    gray = ImageCV.read_and_convert_to_gray_image(template)
+    canny = cv2.Canny(gray, 50, 100)
+    h, w = gray.shape
+    small = cv2.resize(gray, (max(1, w // downsample), max(1, h // downsample)), interpolation=cv2.INTER_AREA)
+    small = cv2.Canny(small, 50, 100)
+    for img in (gray, canny, small):
+        img.setflags(write=False)
+    return gray, canny, small
+
+def clear_detection_cache():
+    _detection_cache.clear()
+    template_edges.cache_clear()
 
 class TemplateDetector(object):
     """
     Argument
         @template:  template image path
         @target:    the image path which you want to detect the template
+
+    The target is read on demand, the found rect, ratio, score and the candidate rectangles
+    are cached by (target path, mtime) so that a new detector of the same image costs nothing
     """
     def __init__(self, template, target):
         super().__init__()
         self.template = template
         self.target = target
-        self._template_canny = ImageCV.read_and_convert_to_edge_image(template)
-        self._target_gray = ImageCV.read_and_convert_to_gray_image(target)
+        self._template_gray, self._template_canny, _ = template_edges(
+            os.path.abspath(template), os.path.getmtime(template)
+        )
+        self._target_gray_img = None
         self._found = None
 
+    @property
+    def _target_gray(self):
+        if self._target_gray_img is None:
+            self._target_gray_img = ImageCV.read_and_convert_to_gray_image(self.target)
+        return self._target_gray_img
+
+    @property
+    def target_shape(self):
+        """(h, w) of the target image"""
+        return self._target_gray.shape[:2]
+
+    @property
+    def score(self):
+        """similarity of the last found template, None before detection"""
+        return None if self._found is None else self._found[0]
+
+    # cached detection of the target, reset when the target file is modified
+    def _cache_entry(self):
+        key = (os.path.abspath(self.target), os.path.getmtime(self.target))
+        entry = _detection_cache.get(key)
+        if entry is None:
+            entry = _detection_cache[key] = {'template': {}, 'rects': {}}
+            while len(_detection_cache) > DETECTION_CACHE_SIZE:
+                _detection_cache.popitem(last=False)
+        else:
+            _detection_cache.move_to_end(key)
+        return entry
+
+    def _get_cached_template(self, kind, method):
+        found = self._cache_entry()['template'].get((os.path.abspath(self.template), kind, method))
+        if found is None:
+            return None
+        LOGGER.debug('Detection cache hit - {}'.format(self.target))
+        rect, self._found = found
+        return rect
+
+    def _put_cached_template(self, kind, method, rect):
+        if rect is not None:
+            key = (os.path.abspath(self.template), kind, method)
+            self._cache_entry()['template'][key] = (rect, self._found)
+        return rect
+
     def ptx_to_rect(self, pos1, pos2):
         x = min(pos1[0], pos2[0])
         y = min(pos1[1], pos2[1])
@@ -37,6 +112,9 @@ class TemplateDetector(object):
         over_size = lambda x, y: x.shape[0] < y.shape[0] or x.shape[1] < y.shape[1]
 
         if method in DETECT_METHOD:
+            rect = self._get_cached_template('multiscale', method)
+            if rect is not None:
+                return rect
             self._found = None
 
             # multiscale
@@ -67,14 +145,121 @@ class TemplateDetector(object):
             top_left = (int(loc[0]*r), int(loc[1]*r))
             bottom_right = (int((loc[0]+template_w)*r), int((loc[1]+template_h)*r))
             rect =  self.ptx_to_rect(top_left, bottom_right)
-            return rect
+            return self._put_cached_template('multiscale', method, rect)
 
         else:
             LOGGER.error('INput method {} is not defined'.format(method))
 
+    # similarity and location of the best match, higher is better
+    def _match(self, target_canny, template_canny, method):
+        match_result = cv2.matchTemplate(target_canny, template_canny, method)
+        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(match_result)
+        if method == cv2.TM_SQDIFF_NORMED:
+            return 1 - min_val, min_loc
+        elif method == cv2.TM_SQDIFF:
+            return -min_val, min_loc
+        return max_val, max_loc
+
+    # match the downsampled template at the given scale of the downsampled target
+    def _match_coarse(self, target_small, template_canny, scale, method):
+        target_h, target_w = target_small.shape
+        dimention = (int(target_w*scale), int(target_h*scale))
+        template_h, template_w = template_canny.shape
+        if dimention[0] < template_w or dimention[1] < template_h:
+            return None
+        resized_target = cv2.resize(target_small, dimention, interpolation=cv2.INTER_AREA)
+        target_canny = cv2.Canny(resized_target, 50, 200)
+        val, loc = self._match(target_canny, template_canny, method)
+        return (val, loc, scale)
+
+    # match the full template in the neighborhood of the coarse location at full resolution
+    def _match_fine(self, center, scale, method):
+        template_h, template_w = self._template_canny.shape
+        target_h, target_w = self._target_gray.shape
+        pad_w, pad_h = template_w / scale, template_h / scale
+        x1, y1 = max(0, int(center[0] - 1.5*pad_w)), max(0, int(center[1] - 1.5*pad_h))
+        x2, y2 = min(target_w, int(center[0] + 1.5*pad_w)), min(target_h, int(center[1] + 1.5*pad_h))
+        dimention = (int((x2-x1)*scale), int((y2-y1)*scale))
+        if dimention[0] < template_w or dimention[1] < template_h:
+            return None
+        resized_target = cv2.resize(self._target_gray[y1:y2, x1:x2], dimention, interpolation=cv2.INTER_AREA)
+        target_canny = cv2.Canny(resized_target, 50, 200)
+        val, loc = self._match(target_canny, self._template_canny, method)
+        return (val, (x1 + loc[0]/scale, y1 + loc[1]/scale), scale)
+
+    def detect_template_pyramid(self, method=cv2.TM_CCOEFF_NORMED, threshold=0.5,
+                                downsample=2, n_coarse=8, n_fine=9, workers=4):
+        """
+        coarse-to-fine version of detect_template over the same target scale range (0.5, 1.0)
+        match n_coarse scales on the target and template downsampled by downsample in a thread pool,
+        stop once the similarity of a normalized method clears threshold,
+        then refine n_fine scales around the best one locally at full resolution
+        """
+        if method not in DETECT_METHOD:
+            LOGGER.error('INput method {} is not defined'.format(method))
+            return
+        rect = self._get_cached_template(('pyramid', threshold, downsample, n_coarse, n_fine), method)
+        if rect is not None:
+            return rect
+
+        target_h, target_w = self._target_gray.shape
+        template_h, template_w = self._template_canny.shape
+        small_size = (max(1, target_w // downsample), max(1, target_h // downsample))
+        target_small = cv2.resize(self._target_gray, small_size, interpolation=cv2.INTER_AREA)
+        _, _, template_small = template_edges(
+            os.path.abspath(self.template), os.path.getmtime(self.template), downsample
+        )
+
+        # coarse: in order of the larger scale first as detect_template, early exit
+        scales = np.linspace(0.5, 1.0, n_coarse)[::-1]
+        coarse = None
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = [executor.submit(self._match_coarse, target_small, template_small, scale, method)
+                       for scale in scales]
+            for future in futures:
+                found = future.result()
+                if found is None:
+                    continue
+                if coarse is None or found[0] > coarse[0]:
+                    coarse = found
+                if method in NORMED_METHOD and coarse[0] >= threshold:
+                    for pending in futures:
+                        pending.cancel()
+                    break
+
+            if coarse is None:
+                LOGGER.warning('Template is larger than the target')
+                return
+
+            # fine: around the coarse scale and location at full resolution
+            val, loc, scale = coarse
+            center = (
+                (loc[0] + template_small.shape[1]/2) * downsample / scale,
+                (loc[1] + template_small.shape[0]/2) * downsample / scale
+            )
+            step = 0.5 / (n_coarse-1)
+            fine_scales = np.clip(np.linspace(scale-step, scale+step, n_fine), 0.5, 1.0)
+            fine = [found for found in executor.map(
+                lambda s: self._match_fine(center, s, method), np.unique(fine_scales)
+            ) if found is not None]
+
+        if not fine:
+            return
+        val, loc, scale = max(fine, key=lambda found: found[0])
+        r = 1 / scale
+        self._found = (val, loc, r)
+        top_left = (int(loc[0]), int(loc[1]))
+        bottom_right = (int(loc[0] + template_w*r), int(loc[1] + template_h*r))
+        rect = self.ptx_to_rect(top_left, bottom_right)
+        return self._put_cached_template(('pyramid', threshold, downsample, n_coarse, n_fine), method, rect)
+
     def detect_rectangle(self, focus_rect=None):
-        self._target_gray[np.where(self._target_gray > [5])] = 120
-        target_threshold = cv2.threshold(self._target_gray, 60, 255, cv2.THRESH_BINARY)[1]
+        entry = self._cache_entry()['rects']
+        if focus_rect in entry:
+            return list(entry[focus_rect])
+
+        # pixel over 5 is the foreground, without modifying the target
+        target_threshold = cv2.threshold(self._target_gray, 5, 255, cv2.THRESH_BINARY)[1]
         cnts = cv2.findContours(target_threshold, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)[1]
         possible_rects = []
 
@@ -89,6 +274,7 @@ class TemplateDetector(object):
                     possible_rects.append((x, y, w, h))
             else:
                 possible_rects.append((x, y, w, h))
+        entry[focus_rect] = tuple(possible_rects)
         return possible_rects
 
 if __name__ == '__main __':
@@ -4,6 +4,7 @@ import os
 import sys
 import time
 import tkinter
+from concurrent.futures import ThreadPoolExecutor
 from inspect import currentframe, getframeinfo
 from tkinter import ttk
 from tkinter.filedialog import askopenfilenames
@@ -13,19 +14,31 @@ import numpy as np
 
 import cv2
 from src import tkconfig
+from src.image.cache import ImageCache, floodfill_cache
 from src.image.imcv import ImageCV
 from src.image.imnp import ImageNP
+from src.image.track import Track, TrackGroup
+from src.support.calibration import measure
 from src.support.msg_box import Instruction, MessageBox
-from src.support.tkconvert import TkConverter
+from src.support.tkconvert import TkConverter, TkPhotoBuffer
 from src.support.msg_box import MessageBox, Instruction
 from src.view.graphcut_app import GraphCutViewer
 
 __FILE__ = os.path.abspath(getframeinfo(currentframe()).filename)
 LOGGER = logging.getLogger(__name__)
 STATE = ['browse', 'edit']
+EXPORT_POLL_MS = 200
+
+class _DisplayFallback(Exception):
+    """the expected export in display resolution"""
 
 class GraphCutAction(GraphCutViewer):
-    def __init__(self):
+    """
+    Argument
+        @cache_mb       memory size in MB to cache the decoded display images
+        @prefetch       number of previous/next images to load in background
+    """
+    def __init__(self, cache_mb=256, prefetch=2):
         super().__init__()
         self.instruction = None
         self._image_queue = []
@@ -36,7 +49,15 @@ class GraphCutAction(GraphCutViewer):
         self._current_br_info = {}
         self._current_body_info = {}
         self._current_state = None
-        self._tmp_eliminate_track = []
+        self._tmp_eliminate_track = Track()
+        self._track_epsilon = 1.0
+        self._export_executor = ThreadPoolExecutor(max_workers=1)
+        self._display_height = int(self.root.winfo_screenheight() * 0.5)
+        self._prefetch = prefetch
+        self._image_cache = ImageCache(self._load_display_image, max_mb=cache_mb)
+        self._photo_buffers = {
+            key: TkPhotoBuffer(self.root) for key in ('panel', 'fl', 'fr', 'bl', 'br', 'body')
+        }
         self._init_instruction()
 
         # color
@@ -108,15 +129,14 @@ class GraphCutAction(GraphCutViewer):
             assert photo is not None
             target_widget.config(image=photo)
         except Exception as e:
-            self._default_photo = ImageNP.generate_checkboard((self._im_h, self._im_w), 10)
-            self._default_photo = TkConverter.ndarray_to_photo(self._default_photo)
+            self._default_photo = TkConverter.checkboard_photo((self._im_h, self._im_w), 10)
             target_widget.config(image=self._default_photo)
 
     # check and update image to input panel
     def _check_and_update_panel(self, img=None):
         try:
             assert img is not None
-            self.photo_panel = TkConverter.cv2_to_photo(img)
+            self.photo_panel = self._photo_buffers['panel'].update(img)
             self._check_and_update_photo(self.label_panel_image, self.photo_panel)
         except Exception as e:
             self._check_and_update_photo(self.label_panel_image, None)
@@ -124,10 +144,8 @@ class GraphCutAction(GraphCutViewer):
     # check and update panel image with floodfill
     def _check_and_update_panel_floodfill(self):
         if self.val_checkbtn_floodfill.get() == 'on':
-            if 'removal' not in self._current_image_info:
-                self._current_image_info['removal'] = self._current_image_info['image'].copy()
-            self._current_image_info['removal'] = ImageCV.run_floodfill(
-                self._current_image_info['removal'],
+            self._current_image_info['removal'] = floodfill_cache.run(
+                self._current_image_info['image'],
                 threshold=0.85,
                 iter_blur=5
             )
@@ -153,7 +171,7 @@ class GraphCutAction(GraphCutViewer):
             tmp_image[:] = tmp_image[:]**val_gamma
             tmp_image[:] *= 255
             tmp_image = tmp_image.astype('uint8')
-            self.photo_panel = TkConverter.cv2_to_photo(tmp_image)
+            self.photo_panel = self._photo_buffers['panel'].update(tmp_image)
             self._current_image_info['preprocess'] = tmp_image
             self._check_and_update_photo(self.label_panel_image, self.photo_panel)
 
@@ -165,10 +183,8 @@ class GraphCutAction(GraphCutViewer):
 
     # check and update image to display panel
     def _check_and_update_display(self):
-        self.photo_small = ImageNP.generate_checkboard((self._im_h//2, self._im_w//3), 10)
-        self.photo_small = TkConverter.ndarray_to_photo(self.photo_small)
-        self.photo_large = ImageNP.generate_checkboard((self._im_h, self._im_w//3), 10)
-        self.photo_large = TkConverter.ndarray_to_photo(self.photo_large)
+        self.photo_small = TkConverter.checkboard_photo((self._im_h//2, self._im_w//3), 10)
+        self.photo_large = TkConverter.checkboard_photo((self._im_h, self._im_w//3), 10)
         self._check_and_update_fl(None)
         self._check_and_update_fr(None)
         self._check_and_update_bl(None)
@@ -179,7 +195,7 @@ class GraphCutAction(GraphCutViewer):
     def _check_and_update_fl(self, img=None):
         try:
             assert img is not None
-            self.photo_fl = TkConverter.cv2_to_photo(img)
+            self.photo_fl = self._photo_buffers['fl'].update(img)
             self._check_and_update_photo(self.label_fl_image, self.photo_fl)
         except Exception as e:
             self._check_and_update_photo(self.label_fl_image, self.photo_small)
@@ -188,7 +204,7 @@ class GraphCutAction(GraphCutViewer):
     def _check_and_update_fr(self, img=None):
         try:
             assert img is not None
-            self.photo_fr = TkConverter.cv2_to_photo(img)
+            self.photo_fr = self._photo_buffers['fr'].update(img)
             self._check_and_update_photo(self.label_fr_image, self.photo_fr)
         except Exception as e:
             self._check_and_update_photo(self.label_fr_image, self.photo_small)
@@ -197,7 +213,7 @@ class GraphCutAction(GraphCutViewer):
     def _check_and_update_bl(self, img=None):
         try:
             assert img is not None
-            self.photo_bl = TkConverter.cv2_to_photo(img)
+            self.photo_bl = self._photo_buffers['bl'].update(img)
             self._check_and_update_photo(self.label_bl_image, self.photo_bl)
         except Exception as e:
             self._check_and_update_photo(self.label_bl_image, self.photo_small)
@@ -206,7 +222,7 @@ class GraphCutAction(GraphCutViewer):
     def _check_and_update_br(self, img=None):
         try:
             assert img is not None
-            self.photo_br = TkConverter.cv2_to_photo(img)
+            self.photo_br = self._photo_buffers['br'].update(img)
             self._check_and_update_photo(self.label_br_image, self.photo_br)
         except Exception as e:
             self._check_and_update_photo(self.label_br_image, self.photo_small)
@@ -215,7 +231,7 @@ class GraphCutAction(GraphCutViewer):
     def _check_and_update_body(self, img=None):
         try:
             assert img is not None
-            self.photo_body = TkConverter.cv2_to_photo(img)
+            self.photo_body = self._photo_buffers['body'].update(img)
             self._check_and_update_photo(self.label_body_image, self.photo_body)
         except Exception as e:
             self._check_and_update_photo(self.label_body_image, self.photo_large)
@@ -257,14 +273,16 @@ class GraphCutAction(GraphCutViewer):
         return cv2.merge((b, g, r, mask))
 
     # draw lines by point record
-    def _draw_lines_by_points(self, img, track, color=(255, 255, 255)):
+    def _draw_lines_by_points(self, img, track, color=(255, 255, 255), thickness=2):
+        if isinstance(track, (Track, TrackGroup)):
+            return track.draw(img, color=color, thickness=thickness)
         for i, record in enumerate(track):
             if len(record) > 2:
-                img = self._draw_lines_by_points(img, record, color=color)
+                img = self._draw_lines_by_points(img, record, color=color, thickness=thickness)
             elif i == 0:
                 continue
             else:
-                cv2.line(img, track[i-1], record, color, 2)
+                cv2.line(img, track[i-1], record, color, thickness)
         return img
 
     # save current image meta
@@ -276,6 +294,8 @@ class GraphCutAction(GraphCutViewer):
         else:
             save_meta = {
                 'symmetry': None,
+                'symmetry_angle': None,
+                'symmetry_confidence': None,
                 'body_width': None,
                 'l_track': None,
                 'r_track': None,
@@ -285,12 +305,15 @@ class GraphCutAction(GraphCutViewer):
             }
             if 'symmetry' in self._current_image_info:
                 save_meta['symmetry'] = self._current_image_info['symmetry']
+            if 'symmetry_angle' in self._current_image_info:
+                save_meta['symmetry_angle'] = self._current_image_info['symmetry_angle']
+                save_meta['symmetry_confidence'] = self._current_image_info['symmetry_confidence']
             if 'body_width' in self._current_image_info:
                 save_meta['body_width'] = self._current_image_info['body_width']
             if 'l_track' in self._current_image_info:
-                save_meta['l_track'] = self._current_image_info['l_track']
+                save_meta['l_track'] = self._current_image_info['l_track'].to_list()
             if 'r_track' in self._current_image_info:
-                save_meta['r_track'] = self._current_image_info['r_track']
+                save_meta['r_track'] = self._current_image_info['r_track'].to_list()
             if 'path' in self._current_image_info:
                 save_meta['path'] = self._current_image_info['path']
             if 'size' in self._current_image_info:
@@ -307,20 +330,24 @@ class GraphCutAction(GraphCutViewer):
         elif not _info:
             LOGGER.warning('No component metadata to save')
         else:
-            save_meta = {
-                'threshold_option': self.val_threshold_option.get(),
-                'threshold': None,
-                'rect': None,
-                'cnts': None
-            }
-            if 'threshold' in _info and self.val_threshold_option.get() == 'manual':
-                save_meta['threshold'] = _info['threshold']
-            if 'rect' in _info:
-                save_meta['rect'] = _info['rect']
-            if 'cnts' in _info:
-                save_meta['cnts'] = tuple(i.tolist() if isinstance(i, np.ndarray) else i for i in _info['cnts'])
-
-            return save_meta
+            return self._component_metadata(_info, self.val_threshold_option.get())
+
+    # convert component info to serializable meta
+    def _component_metadata(self, _info, threshold_option):
+        save_meta = {
+            'threshold_option': threshold_option,
+            'threshold': None,
+            'rect': None,
+            'cnts': None
+        }
+        if 'threshold' in _info and threshold_option == 'manual':
+            save_meta['threshold'] = _info['threshold']
+        if 'rect' in _info:
+            save_meta['rect'] = _info['rect']
+        if 'cnts' in _info and _info['cnts'] is not None:
+            save_meta['cnts'] = tuple(i.tolist() if isinstance(i, np.ndarray) else i for i in _info['cnts'])
+
+        return save_meta
 
     # core function to separate component
     def _separate_component(self):
@@ -333,38 +360,15 @@ class GraphCutAction(GraphCutViewer):
         elif 'l_track' not in self._current_image_info or 'r_track' not in self._current_image_info:
             LOGGER.warning('No tracking label')
         else:
-            # preprocess
-            display_image = None
-            if self.val_checkbtn_floodfill.get() == 'on' and 'removal' in self._current_image_info:
-                display_image = self._current_image_info['removal'].copy()
-            else:
-                display_image = self._current_image_info['image'].copy()
-            display_image = self._separate_component_by_track(display_image)
-            display_image = self._separate_component_by_eliminate(display_image)
-            display_image = self._separate_component_by_line(display_image)
-            display_fl = self._separate_component_by_coor(display_image.copy(), 'fl')
-            display_fr = self._separate_component_by_coor(display_image.copy(), 'fr')
-            display_bl = self._separate_component_by_coor(display_image.copy(), 'bl')
-            display_br = self._separate_component_by_coor(display_image.copy(), 'br')
-
-            # wings mask and get meta - threshold choose by option
-            self._current_fl_info = self._separate_component_by_threshold(display_fl)
-            self._current_fr_info = self._separate_component_by_threshold(display_fr)
-            self._current_bl_info = self._separate_component_by_threshold(display_bl)
-            self._current_br_info = self._separate_component_by_threshold(display_br)
-
-            # body mask and get meta - threshold choose by option
-            display_body = None
-            if self.val_checkbtn_floodfill.get() == 'on' and 'removal' in self._current_image_info:
-                display_body = self._current_image_info['removal'].copy()
-            else:
-                display_body = self._current_image_info['image'].copy()
-            display_body = self._separate_component_by_track(display_body)
-            display_body[np.where(self._current_fl_info['mask'] == 255)] = 255
-            display_body[np.where(self._current_fr_info['mask'] == 255)] = 255
-            display_body[np.where(self._current_bl_info['mask'] == 255)] = 255
-            display_body[np.where(self._current_br_info['mask'] == 255)] = 255
-            self._current_body_info = self._separate_component_by_threshold(display_body)
+            components = self._separate_component_by_info(
+                self._current_image_info,
+                floodfill=self.val_checkbtn_floodfill.get() == 'on'
+            )
+            self._current_fl_info = components['fl']
+            self._current_fr_info = components['fr']
+            self._current_bl_info = components['bl']
+            self._current_br_info = components['br']
+            self._current_body_info = components['body']
 
             # render
             self._check_and_update_fl(self._current_fl_info['show_image'])
@@ -373,68 +377,111 @@ class GraphCutAction(GraphCutViewer):
             self._check_and_update_br(self._current_br_info['show_image'])
             self._check_and_update_body(self._current_body_info['show_image'])
 
+    # separate all components of given image info, val_threshold=None to read from widget
+    def _separate_component_by_info(self, info, floodfill=False, val_threshold=None):
+        # preprocess
+        display_image = None
+        if floodfill and 'removal' in info:
+            display_image = info['removal'].copy()
+        else:
+            display_image = info['image'].copy()
+        display_image = self._separate_component_by_track(display_image, info)
+        display_image = self._separate_component_by_eliminate(display_image, info)
+        display_image = self._separate_component_by_line(display_image, info)
+        display_fl = self._separate_component_by_coor(display_image.copy(), 'fl', info=info)
+        display_fr = self._separate_component_by_coor(display_image.copy(), 'fr', info=info)
+        display_bl = self._separate_component_by_coor(display_image.copy(), 'bl', info=info)
+        display_br = self._separate_component_by_coor(display_image.copy(), 'br', info=info)
+
+        # wings mask and get meta - threshold choose by option
+        fl_info = self._separate_component_by_threshold(display_fl, val_threshold)
+        fr_info = self._separate_component_by_threshold(display_fr, val_threshold)
+        bl_info = self._separate_component_by_threshold(display_bl, val_threshold)
+        br_info = self._separate_component_by_threshold(display_br, val_threshold)
+
+        # body mask and get meta - threshold choose by option
+        display_body = None
+        if floodfill and 'removal' in info:
+            display_body = info['removal'].copy()
+        else:
+            display_body = info['image'].copy()
+        display_body = self._separate_component_by_track(display_body, info)
+        display_body[np.where(fl_info['mask'] == 255)] = 255
+        display_body[np.where(fr_info['mask'] == 255)] = 255
+        display_body[np.where(bl_info['mask'] == 255)] = 255
+        display_body[np.where(br_info['mask'] == 255)] = 255
+        body_info = self._separate_component_by_threshold(display_body, val_threshold)
+
+        return {'fl': fl_info, 'fr': fr_info, 'bl': bl_info, 'br': br_info, 'body': body_info}
+
     # eliminate image by track
-    def _separate_component_by_track(self, img):
-        if 'image' not in self._current_image_info:
+    def _separate_component_by_track(self, img, info=None):
+        info = self._current_image_info if info is None else info
+        if 'image' not in info:
             LOGGER.warning('No process image')
         else:
-            if 'l_track' in self._current_image_info:
-                self._draw_lines_by_points(img, self._current_image_info['l_track'])
-            if 'r_track' in self._current_image_info:
-                self._draw_lines_by_points(img, self._current_image_info['r_track'])
+            thickness = info.get('thickness', 2)
+            if 'l_track' in info:
+                self._draw_lines_by_points(img, info['l_track'], thickness=thickness)
+            if 'r_track' in info:
+                self._draw_lines_by_points(img, info['r_track'], thickness=thickness)
             return img
 
     # eliminate image by eliminate label
-    def _separate_component_by_eliminate(self, img):
-        if 'image' not in self._current_image_info:
+    def _separate_component_by_eliminate(self, img, info=None):
+        info = self._current_image_info if info is None else info
+        if 'image' not in info:
             LOGGER.warning('No process image')
         else:
-            if 'eliminate_track' in self._current_image_info:
-                self._draw_lines_by_points(img, self._current_image_info['eliminate_track'])
+            if 'eliminate_track' in info:
+                self._draw_lines_by_points(img, info['eliminate_track'], thickness=info.get('thickness', 2))
             return img
 
     # eliminate image by line
-    def _separate_component_by_line(self, img):
-        if 'image' not in self._current_image_info:
+    def _separate_component_by_line(self, img, info=None):
+        info = self._current_image_info if info is None else info
+        if 'image' not in info:
             LOGGER.warning('No process image')
         else:
-            if 'l_line' in self._current_image_info:
-                self._draw_lines_by_points(img, self._current_image_info['l_line'])
-            if 'r_line' in self._current_image_info:
-                self._draw_lines_by_points(img, self._current_image_info['r_line'])
+            thickness = info.get('thickness', 2)
+            if 'l_line' in info:
+                self._draw_lines_by_points(img, info['l_line'], thickness=thickness)
+            if 'r_line' in info:
+                self._draw_lines_by_points(img, info['r_line'], thickness=thickness)
             return img
 
     # removal image background by given x and y and part
-    def _separate_component_by_coor(self, img, part, crop=False):
-        bottom_y = lambda track: max([ptx[1] for ptx in track])
-        top_y = lambda track: min([ptx[1] for ptx in track])
-        l_ptx = self._current_image_info['l_line'][0][0]
-        r_ptx = self._current_image_info['r_line'][0][0]
-
-        if part == 'fl' and self._current_image_info['l_track']:
+    def _separate_component_by_coor(self, img, part, crop=False, info=None):
+        info = self._current_image_info if info is None else info
+        bottom_y = lambda track: int(track.ys.max())
+        top_y = lambda track: int(track.ys.min())
+        l_ptx = info['l_line'][0][0]
+        r_ptx = info['r_line'][0][0]
+
+        if part == 'fl' and info['l_track']:
             x = l_ptx
-            y = bottom_y(self._current_image_info['l_track'])
+            y = bottom_y(info['l_track'])
             img[:, x:] = 255
             img[y:, :] = 255
             if crop:
                 img = img[:y, :x]
-        elif part == 'fr' and self._current_image_info['r_track']:
+        elif part == 'fr' and info['r_track']:
             x = r_ptx
-            y = bottom_y(self._current_image_info['r_track'])
+            y = bottom_y(info['r_track'])
             img[:, :x] = 255
             img[y:, :] = 255
             if crop:
                 img = img[:y, x:]
-        elif part == 'bl' and self._current_image_info['l_track']:
+        elif part == 'bl' and info['l_track']:
             x = l_ptx
-            y = top_y(self._current_image_info['l_track'])
+            y = top_y(info['l_track'])
             img[:, x:] = 255
             img[:y, :] = 255
             if crop:
                 img = img[y:, :x]
-        elif part == 'br' and self._current_image_info['r_track']:
+        elif part == 'br' and info['r_track']:
             x = r_ptx
-            y = top_y(self._current_image_info['r_track'])
+            y = top_y(info['r_track'])
             img[:, :x] = 255
             img[:y, :] = 255
             if crop:
@@ -442,53 +489,56 @@ class GraphCutAction(GraphCutViewer):
         return img
 
     # get the mask and connected component by threshold option
-    def _separate_component_by_threshold(self, img):
-        if self.val_threshold_option.get() == 'manual':
-            if 'active' not in self.scale_manual_threshold.state():
+    def _separate_component_by_threshold(self, img, val_threshold=None):
+        if val_threshold is None:
+            if self.val_threshold_option.get() != 'manual':
+                return
+            elif 'active' not in self.scale_manual_threshold.state():
                 LOGGER.error('manual threshold is disable')
-            else:
-                # preprocess
-                save_result = np.zeros(img.shape)
-                val_threshold = int(self.val_manual_threshold.get())
-                gray_img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-                meta = {}
-
-                try:
-                    # contour
-                    ret, mask = cv2.threshold(gray_img, val_threshold, 255, cv2.THRESH_BINARY_INV)
-                    cnts = ImageCV.connected_component_by_stats(mask, 1, cv2.CC_STAT_AREA)
-
-                    # filled component
-                    fill_mask, cnts = ImageCV.fill_connected_component(img, cnts, threshold=255)
-                    target_cnt = ImageNP.contour_to_coor(cnts[0])
-                    x, y, w, h = cv2.boundingRect(cnts[0])
-
-                    # image
-                    save_result[np.where(fill_mask == 255)] = img[np.where(fill_mask == 255)]
-                    save_result = save_result.astype('uint8')
-                    show_result = save_result.copy()
-                    show_result = show_result[y:y+h, x:x+w]
-
-                    assert 200 < w*h < img.shape[0]*img.shape[1]-200
-                    meta = {
-                        'threshold': val_threshold,
-                        'mask': fill_mask,
-                        'cnts': target_cnt,
-                        'rect': (x, y, w, h),
-                        'save_image': self._convert_to_rgba_component(save_result, fill_mask),
-                        'show_image': show_result
-                    }
-                except Exception as e:
-                    meta = {
-                        'threshold': None,
-                        'mask': None,
-                        'cnts': None,
-                        'rect': None,
-                        'save_image': None,
-                        'show_image': None
-                    }
-
-                return meta
+                return
+            val_threshold = int(self.val_manual_threshold.get())
+
+        # preprocess
+        save_result = np.zeros(img.shape)
+        gray_img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        meta = {}
+
+        try:
+            # contour
+            ret, mask = cv2.threshold(gray_img, val_threshold, 255, cv2.THRESH_BINARY_INV)
+            cnts = ImageCV.connected_component_by_stats(mask, 1, cv2.CC_STAT_AREA)
+
+            # filled component
+            fill_mask, cnts = ImageCV.fill_connected_component(img, cnts, threshold=255)
+            target_cnt = ImageNP.contour_to_coor(cnts[0])
+            x, y, w, h = cv2.boundingRect(cnts[0])
+
+            # image
+            save_result[np.where(fill_mask == 255)] = img[np.where(fill_mask == 255)]
+            save_result = save_result.astype('uint8')
+            show_result = save_result.copy()
+            show_result = show_result[y:y+h, x:x+w]
+
+            assert 200 < w*h < img.shape[0]*img.shape[1]-200
+            meta = {
+                'threshold': val_threshold,
+                'mask': fill_mask,
+                'cnts': target_cnt,
+                'rect': (x, y, w, h),
+                'save_image': self._convert_to_rgba_component(save_result, fill_mask),
+                'show_image': show_result
+            }
+        except Exception as e:
+            meta = {
+                'threshold': None,
+                'mask': None,
+                'cnts': None,
+                'rect': None,
+                'save_image': None,
+                'show_image': None
+            }
+
+        return meta
 
     # switch to different state
     def _switch_state(self, state):
@@ -542,9 +592,15 @@ class GraphCutAction(GraphCutViewer):
             if self._flag_body_width:
                 self._render_panel_image()
             else:
-                # generate symmetry line
+                # generate symmetry line, keep it vertical at the axis of centroid height
                 self._current_image_info['panel'] = self._current_image_info['image'].copy()
-                self._current_image_info['symmetry'] = ImageNP.generate_symmetric_line(self._current_image_info['panel'])
+                center, angle, confidence = ImageNP.generate_symmetric_axis(self._current_image_info['panel'])
+                line_x = int(round(center[0]))
+                self._current_image_info['symmetry'] = ((line_x, 0), (line_x, self._im_h))
+                self._current_image_info['symmetry_axis'] = (center, angle)
+                self._current_image_info['symmetry_angle'] = round(angle, 2)
+                self._current_image_info['symmetry_confidence'] = round(confidence, 3)
+                self.label_symmetry.config(text=u'對稱軸 傾斜 {:.1f}° 信心 {:.2f}'.format(angle, confidence))
                 self._render_panel_image()
 
                 # rebind the keyboard event
@@ -571,6 +627,13 @@ class GraphCutAction(GraphCutViewer):
                 self._current_image_info['panel'] = self._current_image_info['preprocess'].copy()
             else:
                 self._current_image_info['panel'] = self._current_image_info['image'].copy()
+            if 'symmetry_axis' in self._current_image_info:
+                (center_x, center_y), angle = self._current_image_info['symmetry_axis']
+                if abs(angle) >= 0.5:
+                    tilt = np.tan(np.deg2rad(angle))
+                    pt1 = (int(round(center_x - center_y*tilt)), 0)
+                    pt2 = (int(round(center_x + (self._im_h-center_y)*tilt)), self._im_h)
+                    cv2.line(self._current_image_info['panel'], pt1, pt2, [128, 128, 128], 1)
             if 'symmetry' in self._current_image_info:
                 pt1, pt2 = self._current_image_info['symmetry']
                 cv2.line(self._current_image_info['panel'], pt1, pt2, [0, 0, 0], 2)
@@ -626,7 +689,7 @@ class GraphCutAction(GraphCutViewer):
         self._flag_drawing_right = False
         self._flag_drew_right = False
         self._flag_drawing_eliminate = False
-        self._tmp_eliminate_track = []
+        self._tmp_eliminate_track = Track()
 
         # reset widget
         self.val_checkbtn_floodfill.set('off')
@@ -659,22 +722,31 @@ class GraphCutAction(GraphCutViewer):
         elif index < 0 or index >= len(self._image_queue):
             LOGGER.error('Image queue out of index')
         else:
+            image, size = self._image_cache.get(self._image_queue[index])
             self._current_image_info = {
                 'index': index,
                 'path': self._image_queue[index],
-                'image': cv2.imread(self._image_queue[index])
+                'image': image.copy(),
+                'size': size
             }
             LOGGER.info('Read image - {}'.format(self._current_image_info['path']))
-            self._current_image_info['size'] = self._current_image_info['image'].shape[:2]
-            self._current_image_info['image'] = self.auto_resize(self._current_image_info['image'])
             self._current_image_info['resize'] = self._current_image_info['image'].shape[:2]
             self.label_resize.config(text=u'原有尺寸 {}X{} -> 顯示尺寸 {}X{}'.format(
                 *self._current_image_info['size'][::-1], *self._current_image_info['resize'][::-1]
             ))
+            self.label_symmetry.config(text=u'對稱軸 N/A')
             self._im_h, self._im_w = self._current_image_info['resize']
             self._reset_parameter()
             self._switch_state(state='browse')
 
+            # load the neighbor images in background
+            neighbors = self._image_queue[max(0, index-self._prefetch):index+self._prefetch+1]
+            self._image_cache.prefetch(neighbors)
+
+    # read image and resize to display height, run in the background thread
+    def _load_display_image(self, path):
+        return ImageCV.read_display_image(path, self._display_height)
+
     # callback: drag the ttk.Scale and show the current value
     def _update_scale_gamma(self, val_gamma):
         # update msg
@@ -798,13 +870,19 @@ class GraphCutAction(GraphCutViewer):
             if self._flag_drawing_left or self._flag_drawing_right:
                 self._render_panel_image()
 
+    # decimate the finished stroke and its mirror
+    def _simplify_tracks(self):
+        for key in ('l_track', 'r_track'):
+            if key in self._current_image_info:
+                self._current_image_info[key].simplify(self._track_epsilon)
+
     # mouse: lock to draw left or right
     def _m_lock_track_flag(self, event=None):
         # check
         if 'l_track' not in self._current_image_info:
-            self._current_image_info['l_track'] = []
+            self._current_image_info['l_track'] = Track()
         if 'r_track' not in self._current_image_info:
-            self._current_image_info['r_track'] = []
+            self._current_image_info['r_track'] = Track()
 
         # lock and logic operation
         if 'panel' not in self._current_image_info:
@@ -816,16 +894,16 @@ class GraphCutAction(GraphCutViewer):
         elif 0 <= event.x <= self._current_image_info['l_line'][0][0]:
             self._flag_drawing_left = True
             self._flag_drew_left = False
-            self._current_image_info['l_track'] = []
+            self._current_image_info['l_track'] = Track()
             if not self._flag_drew_right:
-                self._current_image_info['r_track'] = []
+                self._current_image_info['r_track'] = Track()
             LOGGER.info('Lock the LEFT flag')
         elif self._current_image_info['r_line'][0][0] <= event.x <= self._im_w:
             self._flag_drawing_right = True
             self._flag_drew_right = False
-            self._current_image_info['r_track'] = []
+            self._current_image_info['r_track'] = Track()
             if not self._flag_drew_left:
-                self._current_image_info['l_track'] = []
+                self._current_image_info['l_track'] = Track()
             LOGGER.info('Lock the RIGHT flag')
 
     # mouse: unlock to confirm draw left or right
@@ -835,11 +913,13 @@ class GraphCutAction(GraphCutViewer):
         elif self._flag_drawing_left:
             self._flag_drawing_left = False
             self._flag_drew_left = True
+            self._simplify_tracks()
             self._separate_component()
             LOGGER.info('Unlock the LEFT flag')
         elif self._flag_drawing_right:
             self._flag_drawing_right = False
             self._flag_drew_right = True
+            self._simplify_tracks()
             self._separate_component()
             LOGGER.info('Unlock the RIGHT flag')
 
@@ -866,7 +946,7 @@ class GraphCutAction(GraphCutViewer):
         elif not self._flag_body_width:
             LOGGER.error('Please to confirm the body width first')
         else:
-            self._tmp_eliminate_track = []
+            self._tmp_eliminate_track = Track()
             self._flag_drawing_eliminate = True
             LOGGER.info('Lock the ELIMINATE flag')
 
@@ -875,10 +955,11 @@ class GraphCutAction(GraphCutViewer):
         if self._flag_drawing_eliminate:
             self._flag_drawing_eliminate = False
             if 'eliminate_track' not in self._current_image_info:
-                self._current_image_info['eliminate_track'] = []
+                self._current_image_info['eliminate_track'] = TrackGroup()
             if self._tmp_eliminate_track:
+                self._tmp_eliminate_track.simplify(self._track_epsilon)
                 self._current_image_info['eliminate_track'].append(self._tmp_eliminate_track)
-            self._tmp_eliminate_track = []
+            self._tmp_eliminate_track = Track()
             self._separate_component()
             LOGGER.info('Unlock the ELIMINATE flag')
 
@@ -896,7 +977,8 @@ class GraphCutAction(GraphCutViewer):
         ):
             LOGGER.warning('No component metadata to process')
         else:
-            # metadata
+            # metadata in display resolution, also the fallback of full resolution export
+            threshold_option = self.val_threshold_option.get()
             all_metadata = {
                 'image': self._save_image_metadata(),
                 'fl': self._save_component_metadata(self._current_fl_info),
@@ -905,45 +987,152 @@ class GraphCutAction(GraphCutViewer):
                 'br': self._save_component_metadata(self._current_br_info),
                 'body': self._save_component_metadata(self._current_body_info)
             }
+            display_components = {
+                'fl': self._current_fl_info,
+                'fr': self._current_fr_info,
+                'bl': self._current_bl_info,
+                'br': self._current_br_info,
+                'body': self._current_body_info
+            }
 
             # save path
             current_img_path = self._current_image_info['path']
             save_directory = os.sep.join(current_img_path.split('.')[:-1])
 
-            if not os.path.exists(save_directory):
-                os.makedirs(save_directory)
-
-            save_filename = os.path.join(save_directory, 'metadata.json')
-            with open(save_filename, 'w+') as f:
-                json.dump(all_metadata, f)
-                LOGGER.info('Save metadata - {}'.format(save_filename))
-
-            # save image
-            if 'save_image' in self._current_fl_info and self._current_fl_info['save_image'] is not None:
-                save_imgname = os.path.join(save_directory, 'fore_left.png')
-                cv2.imwrite(save_imgname, self._current_fl_info['save_image'])
-                LOGGER.info('Save fore-left component - {}'.format(save_imgname))
-            if 'save_image' in self._current_fr_info and self._current_fr_info['save_image'] is not None:
-                save_imgname = os.path.join(save_directory, 'fore_right.png')
-                cv2.imwrite(save_imgname, self._current_fr_info['save_image'])
-                LOGGER.info('Save fore-right component - {}'.format(save_imgname))
-            if 'save_image' in self._current_bl_info and self._current_bl_info['save_image'] is not None:
-                save_imgname = os.path.join(save_directory, 'back_left.png')
-                cv2.imwrite(save_imgname, self._current_bl_info['save_image'])
-                LOGGER.info('Save back-left component - {}'.format(save_imgname))
-            if 'save_image' in self._current_br_info and self._current_br_info['save_image'] is not None:
-                save_imgname = os.path.join(save_directory, 'back_right.png')
-                cv2.imwrite(save_imgname, self._current_br_info['save_image'])
-                LOGGER.info('Save back-right component - {}'.format(save_imgname))
-            if 'save_image' in self._current_body_info and self._current_body_info['save_image'] is not None:
-                save_imgname = os.path.join(save_directory, 'body.png')
-                cv2.imwrite(save_imgname, self._current_body_info['save_image'])
-                LOGGER.info('Save body component - {}'.format(save_imgname))
+            # rerun the separation in original resolution on the worker thread
+            val_threshold = None
+            if threshold_option == 'manual':
+                val_threshold = int(self.val_manual_threshold.get())
+            future = self._export_executor.submit(
+                self._export_all_components,
+                save_directory,
+                dict(self._current_image_info),
+                all_metadata,
+                display_components,
+                threshold_option,
+                val_threshold,
+                self.val_checkbtn_floodfill.get() == 'on'
+            )
+            self.root.after(EXPORT_POLL_MS, self._poll_export, future, save_directory)
 
             self._switch_state('browse')
             self._k_switch_to_next_image()
             Mbox = MessageBox()
-            Mbox.info(string=u'已儲存')
+            Mbox.info(string=u'已儲存 (原始尺寸輸出處理中)')
+
+    # poll the export on the tk thread, alert when it failed
+    def _poll_export(self, future, save_directory):
+        if not future.done():
+            self.root.after(EXPORT_POLL_MS, self._poll_export, future, save_directory)
+            return
+        error = future.exception()
+        if error is not None:
+            LOGGER.error('Failed to save {} - {}'.format(save_directory, error), exc_info=error)
+            Mbox = MessageBox()
+            Mbox.alert(title='Error', string=u'儲存失敗: {}\n{}'.format(save_directory, error))
+
+    # scale the display resolution info to the original resolution
+    def _scale_image_info(self, info, image):
+        resize_h, resize_w = info['resize']
+        size_h, size_w = image.shape[:2]
+        ratio_x, ratio_y = size_w / resize_w, size_h / resize_h
+        scale_ptx = lambda ptx: (int(round(ptx[0]*ratio_x)), int(round(ptx[1]*ratio_y)))
+
+        full_info = {
+            'path': info['path'],
+            'size': info['size'],
+            'image': image,
+            'ratio': (ratio_x, ratio_y),
+            'thickness': max(2, int(round(2*max(ratio_x, ratio_y))))
+        }
+        for key in ('l_track', 'r_track'):
+            if key in info:
+                full_info[key] = info[key].scale(ratio_x, ratio_y)
+        if 'eliminate_track' in info:
+            full_info['eliminate_track'] = TrackGroup(
+                t.scale(ratio_x, ratio_y) for t in info['eliminate_track'])
+        for key in ('symmetry', 'l_line', 'r_line'):
+            if key in info:
+                full_info[key] = tuple(scale_ptx(ptx) for ptx in info[key])
+        return full_info
+
+    # worker: separate components in original resolution and save, fallback to display resolution
+    def _export_all_components(self, save_directory, info, all_metadata, display_components,
+                               threshold_option, val_threshold, floodfill):
+        components = display_components
+        try:
+            if val_threshold is None:
+                raise _DisplayFallback('only manual threshold supports full resolution export')
+            image = cv2.imread(info['path'])
+            if image is None:
+                raise IOError('cannot read {}'.format(info['path']))
+            full_info = self._scale_image_info(info, image)
+            if floodfill:
+                full_info['removal'] = floodfill_cache.run(image, threshold=0.85, iter_blur=5)
+            full_components = self._separate_component_by_info(full_info, floodfill, val_threshold)
+            if any(full_components[part]['mask'] is None for part in ('fl', 'fr', 'bl', 'br')):
+                raise ValueError('missing component mask in original resolution')
+
+            # metadata in original resolution
+            ratio_x, ratio_y = full_info['ratio']
+            image_meta = dict(all_metadata['image'])
+            image_meta['resize'] = info['resize']
+            if 'symmetry' in full_info:
+                image_meta['symmetry'] = full_info['symmetry']
+            if image_meta['body_width'] is not None:
+                image_meta['body_width'] = int(round(image_meta['body_width']*ratio_x))
+            for key in ('l_track', 'r_track'):
+                if key in full_info:
+                    image_meta[key] = full_info[key].to_list()
+            all_metadata = {part: self._component_metadata(meta, threshold_option)
+                            for part, meta in full_components.items()}
+            all_metadata['image'] = image_meta
+            components = full_components
+            LOGGER.info('Separate components in original resolution {}x{}'.format(
+                image.shape[1], image.shape[0]))
+        except _DisplayFallback as e:
+            LOGGER.info('Save display resolution - {}'.format(e))
+        except Exception as e:
+            LOGGER.exception('Failed to export in original resolution, save display resolution instead')
+
+        if not os.path.exists(save_directory):
+            os.makedirs(save_directory)
+
+        save_filename = os.path.join(save_directory, 'metadata.json')
+
+        # keep the calibration by batch_calibration.py and measure the new components
+        calibration = None
+        if os.path.exists(save_filename):
+            try:
+                with open(save_filename, 'r') as f:
+                    calibration = json.load(f).get('calibration')
+            except ValueError as e:
+                LOGGER.warning('Cannot read the previous metadata {} - {}'.format(save_filename, e))
+        if calibration:
+            try:
+                calibration.update(measure(all_metadata, calibration.get('px_per_mm')))
+            except (ValueError, TypeError) as e:
+                LOGGER.exception('Cannot measure the components of {} - {}'.format(save_filename, e))
+                calibration.update({'body_width_mm': None, 'area_mm2': None})
+            all_metadata['calibration'] = calibration
+
+        with open(save_filename, 'w+') as f:
+            json.dump(all_metadata, f, separators=(',', ':'))
+            LOGGER.info('Save metadata - {}'.format(save_filename))
+
+        # save image
+        for part, filename, name in (
+            ('fl', 'fore_left.png', 'fore-left'),
+            ('fr', 'fore_right.png', 'fore-right'),
+            ('bl', 'back_left.png', 'back-left'),
+            ('br', 'back_right.png', 'back-right'),
+            ('body', 'body.png', 'body')
+        ):
+            _info = components[part]
+            if _info and 'save_image' in _info and _info['save_image'] is not None:
+                save_imgname = os.path.join(save_directory, filename)
+                cv2.imwrite(save_imgname, _info['save_image'])
+                LOGGER.info('Save {} component - {}'.format(name, save_imgname))
 
     # keyboard: show instruction
     def _k_show_instruction(self, event=None):
@@ -993,21 +1182,6 @@ class GraphCutAction(GraphCutViewer):
         else:
             LOGGER.warning('No given image')
 
-    # auto fit the image hight from original image to resize image
-    def auto_resize(self, image, ratio=0.5):
-        screen_h = self.root.winfo_screenheight()
-        screen_w = self.root.winfo_screenwidth()
-        image_h, image_w, image_channel = image.shape
-        resize_h = screen_h * ratio
-        resize_w = (resize_h / image_h) * image_w
-        resize_h, resize_w = int(resize_h), int(resize_w)
-        image = cv2.resize(image, (resize_w, resize_h),
-                           interpolation=cv2.INTER_AREA)
-        LOGGER.info('resize image from {}x{} to {}x{}'.format(
-            image_w, image_h, int(resize_w), int(resize_h)
-        ))
-        return image
-
     # open filedialog to get input image paths
     def input_images(self):
         initdir = os.path.abspath(os.path.join(__FILE__, '../../../'))
@@ -7,6 +7,7 @@ import sys
 import cv2
 
 sys.path.append('../')
+from src.image.cache import floodfill_cache
 from src.image.imnp import ImageNP
 from src.image.imcv import ImageCV
 from src.support.profiling import func_profiling
@@ -77,7 +78,7 @@ class PreprocessKeyboard(KeyboardHandler, PreprocessViewer):
         self.root_state.append('edit')
 
         # show the default display image
-        display_image = ImageCV.run_floodfill(self.image_panel, threshold, iter_blur)
+        display_image = floodfill_cache.run(self.image_panel, threshold, iter_blur)
         self._update_display(display_image)
         self.root_state.append('result')
 
@@ -115,7 +116,7 @@ class PreprocessKeyboard(KeyboardHandler, PreprocessViewer):
             save_path = self.current_image_path.split('.')
             save_path[0] += '_floodfill'
             save_path = '.'.join(save_path)
-            save_image = ImageCV.run_floodfill(self.image_panel, threshold, iter_blur)
+            save_image = floodfill_cache.run(self.image_panel, threshold, iter_blur)
             cv2.imwrite(save_path, save_image)
             self.state_message = _msg
             self._sync_state()
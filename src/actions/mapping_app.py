@@ -14,8 +14,9 @@ import numpy as np
 
 import cv2
 from src import tkconfig
-from src.actions.alignment import AlignmentCore
-from src.image.imnp import ImageNP
+from src.actions.alignment import SCORE_THRESHOLD, AlignmentCore
+from src.support.matrix_io import MATRIX_FILE, save_matrix
+from src.support.matrix_registry import MatrixRegistry
 from src.support.msg_box import MessageBox
 from src.support.tkconvert import TkConverter
 from src.view.mapping_app import (AutoMappingViewer, EntryMappingViewer,
@@ -26,10 +27,11 @@ __FILE__ = os.path.abspath(getframeinfo(currentframe()).filename)
 LOGGER = logging.getLogger(__name__)
 
 class EntryMappingAction(EntryMappingViewer):
-    def __init__(self):
+    def __init__(self, rig=None):
         super().__init__()
         self._img_path = None
         self._temp_path = None
+        self.val_rig.set(rig or '')
 
         self.btn_img_path.config(command=self._load_img_path)
         self.btn_temp_path.config(command=self._load_temp_path)
@@ -62,18 +64,20 @@ class EntryMappingAction(EntryMappingViewer):
             Mbox = MessageBox()
             Mbox.alert(title='Warning', string=u'請選擇熱像儀 (灰階) 圖片資料夾')
         else:
-            LOGGER.info('Ready to process auto mapping.')
+            rig = self.val_rig.get().strip() or None
+            LOGGER.info('Ready to process auto mapping. (rig={})'.format(rig))
             self.root.destroy()
-            automapping_action = AutoMappingAction(self._img_path, self._temp_path)
+            automapping_action = AutoMappingAction(self._img_path, self._temp_path, rig=rig)
             automapping_action.mainloop()
 
 class AutoMappingAction(AutoMappingViewer):
-    def __init__(self, img_path, temp_path):
+    def __init__(self, img_path, temp_path, rig=None):
         super().__init__()
         self._img_path = img_path
         self._temp_path = temp_path
+        self._rig = rig
         self._show_img = None
-        self._alignment = None
+        self.alignment = None
         self.run()
 
         self.button_reload.config(command=self._reload)
@@ -85,6 +89,12 @@ class AutoMappingAction(AutoMappingViewer):
         if self._show_img is not None:
             self.show_photo = TkConverter.cv2_to_photo(self._show_img)
             self.label_mapping_result.config(image=self.show_photo)
+            self.label_score.config(text=u'對應分數 (IoU): {:.3f} - {}'.format(
+                self.alignment.score, self.alignment.method
+            ))
+            if self.alignment.score < SCORE_THRESHOLD:
+                Mbox = MessageBox()
+                Mbox.alert(title='Warning', string=u'自動對應分數過低, 建議手動定位')
         else:
             Mbox = MessageBox()
             Mbox.alert(title='Warning', string=u'無法自動對應, 請嘗試手動定位')
@@ -92,14 +102,14 @@ class AutoMappingAction(AutoMappingViewer):
     # reload to previous action
     def _reload(self):
         self.root.destroy()
-        entry_action = EntryMappingAction()
+        entry_action = EntryMappingAction(rig=self._rig)
         entry_action.mainloop()
 
     # manual mapping
     def _manual(self):
         LOGGER.info('Ready to process manual mapping')
         self.root.destroy()
-        manualmapping = ManualMappingAction(self._img_path, self._temp_path)
+        manualmapping = ManualMappingAction(self._img_path, self._temp_path, rig=self._rig)
         manualmapping.mainloop()
 
     # output transform matrix and close windows
@@ -112,9 +122,13 @@ class AutoMappingAction(AutoMappingViewer):
             if not os.path.exists(save_path):
                 os.makedirs(save_path)
 
-            save_file = os.sep.join((save_path, 'transform_matrix.dat'))
-            self.alignment.transform_matrix.tofile(save_file)
-            LOGGER.info('Save transform matrix file - {}'.format(save_file))
+            save_file = os.sep.join((save_path, MATRIX_FILE))
+            save_matrix(
+                save_file, self.alignment.transform_matrix,
+                photo_size=self.alignment.photo_size, thermal_size=self.alignment.thermal_size,
+                method=self.alignment.method, score=self.alignment.score
+            )
+            self.alignment.register()
             Mbox = MessageBox()
             Mbox.info(string='Done.', parent=self.root)
         else:
@@ -123,7 +137,8 @@ class AutoMappingAction(AutoMappingViewer):
     # run the alignment code and get the result img
     def run(self):
         try:
-            self.alignment = AlignmentCore(self._img_path, self._temp_path)
+            self.alignment = AlignmentCore(self._img_path, self._temp_path,
+                                           registry=MatrixRegistry(), rig=self._rig)
             self._show_img = self.alignment.run()
 
             self._original_img = self.alignment.original_img.copy()
@@ -139,16 +154,20 @@ class AutoMappingAction(AutoMappingViewer):
             self._manual()
 
 class ManualMappingAction(ManualMappingViewer):
-    def __init__(self, img_path, temp_path):
+    def __init__(self, img_path, temp_path, rig=None):
         super().__init__()
         self.transform_matrix = None
         self._img_path = img_path
         self._temp_path = temp_path
+        self._rig = rig
         self._panel_anchor = []
         self._display_anchor = []
+        self._registry = MatrixRegistry()
+        self._registry_key = None
 
         # preprocess
         self._load_image()
+        self._prefill_anchor()
 
         # callback
         self.button_reload.config(command=self._reload)
@@ -178,6 +197,9 @@ class ManualMappingAction(ManualMappingViewer):
         # read panel/display image
         self._panel_img = cv2.imread(self._img_path)
         self._display_img = cv2.imread(thermal_file)
+        self._registry_key = self._registry.key(self._panel_img.shape, self._display_img.shape, self._rig)
+        self._photo_size = self._panel_img.shape[:2][::-1]
+        self._thermal_size = self._display_img.shape[:2][::-1]
         self._img_h, self._img_w = self._display_img.shape[0], self._display_img.shape[1]
         self._panel_img = cv2.resize(self._panel_img, (self._img_w, self._img_h))
 
@@ -188,6 +210,25 @@ class ManualMappingAction(ManualMappingViewer):
         # update and sync
         self._update_image()
 
+    # prefill the anchors by the registry matrix of the same rig
+    def _prefill_anchor(self, margin=0.2):
+        M = self._registry.get(self._registry_key)
+        if M is None:
+            return
+
+        x0, x1 = int(self._img_w*margin), int(self._img_w*(1-margin))
+        y0, y1 = int(self._img_h*margin), int(self._img_h*(1-margin))
+        display_anchor = np.array([[x0, y0], [x0, y1], [x1, y0], [x1, y1]], dtype='float64')
+        panel_anchor = cv2.perspectiveTransform(display_anchor.reshape(-1, 1, 2), M).reshape(-1, 2)
+        if not np.isfinite(panel_anchor).all():
+            return
+
+        timestamp = time.time()
+        self._display_anchor.extend((int(x), int(y), timestamp) for x, y in display_anchor)
+        self._panel_anchor.extend((int(round(x)), int(round(y)), timestamp) for x, y in panel_anchor)
+        LOGGER.info('Prefill anchors by the registry matrix of {}'.format(self._registry_key))
+        self._render_anchor()
+
     # convert image to photo and update to panel/display
     def _update_image(self):
         try:
@@ -198,8 +239,7 @@ class ManualMappingAction(ManualMappingViewer):
         except Exception as e:
             # generate default ndarray image to photo
             LOGGER.warning('Cannot update image properly')
-            self.photo_panel = ImageNP.generate_checkboard((239, 320), block_size=10)
-            self.photo_panel = TkConverter.ndarray_to_photo(self.photo_panel)
+            self.photo_panel = TkConverter.checkboard_photo((239, 320), block_size=10)
             self.photo_display = self.photo_panel
 
         self.label_panel_image.config(image=self.photo_panel)
@@ -251,7 +291,7 @@ class ManualMappingAction(ManualMappingViewer):
     def _reload(self):
         LOGGER.info('Ready to process auto mapping')
         self.root.destroy()
-        automapping_action = AutoMappingAction(self._img_path, self._temp_path)
+        automapping_action = AutoMappingAction(self._img_path, self._temp_path, rig=self._rig)
         automapping_action.mainloop()
 
     # callback: preview the result
@@ -283,9 +323,11 @@ class ManualMappingAction(ManualMappingViewer):
             if not os.path.exists(save_path):
                 os.makedirs(save_path)
 
-            save_file = os.sep.join((save_path, 'transform_matrix.dat'))
-            M.tofile(save_file)
-            LOGGER.info('Save transform matrix file - {}'.format(save_file))
+            save_file = os.sep.join((save_path, MATRIX_FILE))
+            save_matrix(
+                save_file, M, photo_size=self._photo_size, thermal_size=self._thermal_size, method='manual'
+            )
+            self._registry.register(self._registry_key, M, method='manual')
             Mbox = MessageBox()
             Mbox.info(string='Done.')
 
@@ -9,6 +9,7 @@ import numpy as np
 
 sys.path.append('../')
 from src import tkconfig
+from src.image.cache import floodfill_cache
 from src.image.imcv import ImageCV
 from src.support.profiling import func_profiling
 from src.support.tkconvert import TkConverter
@@ -38,7 +39,7 @@ class PreprocessMouse(MouseHandler, PreprocessViewer):
     def render_display(self, event=None):
         threshold = float(self.scale_threshold.get())
         iter_blur = int(self.scale_iter.get())
-        display_image = ImageCV.run_floodfill(self.image_panel, threshold, iter_blur)
+        display_image = floodfill_cache.run(self.image_panel, threshold, iter_blur)
         self._update_display(display_image)
         self.root_state.append('result')
 
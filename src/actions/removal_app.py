@@ -7,8 +7,8 @@ sys.path.append('../..')
 
 import cv2
 from src import tkconfig
+from src.image.cache import floodfill_cache
 from src.image.imcv import ImageCV
-from src.image.imnp import ImageNP
 from src.support.msg_box import Instruction, MessageBox
 from src.support.tkconvert import TkConverter
 from src.view.removal_app import RemovalViewer
@@ -71,8 +71,7 @@ class RemovalAction(RemovalViewer):
             assert photo is not None
             target_widget.config(image=photo)
         except Exception as e:
-            self._default_photo = ImageNP.generate_checkboard((self._im_h, self._im_w), 10)
-            self._default_photo = TkConverter.ndarray_to_photo(self._default_photo)
+            self._default_photo = TkConverter.checkboard_photo((self._im_h, self._im_w), 10)
             target_widget.config(image=self._default_photo)
 
     # check and update image to input panel
@@ -148,14 +147,15 @@ class RemovalAction(RemovalViewer):
         elif index < 0 or index >= len(self._image_queue):
             LOGGER.error('Image queue out of index')
         else:
+            image, size = ImageCV.read_display_image(
+                self._image_queue[index], int(self.root.winfo_screenheight() * 0.5))
             self._current_image_info = {
                 'index': index,
                 'path': self._image_queue[index],
-                'image': cv2.imread(self._image_queue[index])
+                'image': image,
+                'size': size
             }
             LOGGER.info('Read image - {}'.format(self._current_image_info['path']))
-            self._current_image_info['size'] = self._current_image_info['image'].shape[:2]
-            self._current_image_info['image'] = self.auto_resize(self._current_image_info['image'])
             self._current_image_info['resize'] = self._current_image_info['image'].shape[:2]
             self.label_resize.config(text=u'原有尺寸 {}X{} -> 顯示尺寸 {}X{}'.format(
                 *self._current_image_info['size'][::-1], *self._current_image_info['resize'][::-1]
@@ -168,7 +168,7 @@ class RemovalAction(RemovalViewer):
     def _update_floodfill_image(self):
         if self._current_state == 'edit':
             # running floodfill
-            self.display_image = ImageCV.run_floodfill(
+            self.display_image = floodfill_cache.run(
                 self._current_image_info['image'],
                 float(self.val_scale_threshold.get()),
                 int(self.val_scale_iter.get())
@@ -277,20 +277,6 @@ class RemovalAction(RemovalViewer):
             self._check_and_update_panel(self._current_image_info['image'])
             self._check_and_update_display(None)
 
-    # auto fit the image hight from original image to resize image
-    def auto_resize(self, image, ratio=0.5):
-        screen_h = self.root.winfo_screenheight()
-        screen_w = self.root.winfo_screenwidth()
-        image_h, image_w, image_channel = image.shape
-        resize_h = screen_h * ratio
-        resize_w = (resize_h / image_h) * image_w
-        resize_h, resize_w = int(resize_h), int(resize_w)
-        image = cv2.resize(image, (resize_w, resize_h),interpolation=cv2.INTER_AREA)
-        LOGGER.info('resize image from {}x{} to {}x{}'.format(
-            image_w, image_h, int(resize_w), int(resize_h)
-        ))
-        return image
-
 if __name__ == '__main__':
     logging.basicConfig(
         level=logging.INFO,
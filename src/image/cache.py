@@ -0,0 +1,182 @@
+"""
+cache.py
+    [class] LRUCache: thread-safe LRU cache bounded by memory size
+    [class] ImageCache: cache the decoded image and prefetch the neighbors in background
+    [class] FloodfillCache: memoize ImageCV.run_floodfill by image content and parameters
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from src.image.imcv import ImageCV
+
+LOGGER = logging.getLogger(__name__)
+
+class LRUCache(object):
+    """
+    Least recently used cache, evict the oldest entries when the total size
+    is over max_mb, the size of entry is estimated by the ndarray it holds
+
+    Argument
+        @max_mb     maximum cache size in MB
+    """
+    def __init__(self, max_mb=256):
+        super().__init__()
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._nbytes = 0
+        self._lock = threading.RLock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    @staticmethod
+    def sizeof(value):
+        if isinstance(value, np.ndarray):
+            return value.nbytes
+        elif isinstance(value, (tuple, list)):
+            return sum(LRUCache.sizeof(v) for v in value)
+        elif isinstance(value, dict):
+            return sum(LRUCache.sizeof(v) for v in value.values())
+        return 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        nbytes = self.sizeof(value)
+        if nbytes > self.max_bytes:
+            LOGGER.debug('Skip caching {}, {} bytes over the cache size'.format(key, nbytes))
+            return value
+
+        with self._lock:
+            if key in self._entries:
+                self._nbytes -= self._sizes.pop(key)
+                del self._entries[key]
+            self._entries[key] = value
+            self._sizes[key] = nbytes
+            self._nbytes += nbytes
+
+            while self._nbytes > self.max_bytes:
+                old_key, _ = self._entries.popitem(last=False)
+                self._nbytes -= self._sizes.pop(old_key)
+                LOGGER.debug('Evict {} from cache'.format(old_key))
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._nbytes = 0
+
+class ImageCache(LRUCache):
+    """
+    Cache the result of loader(path) and load the given paths in background
+
+    Argument
+        @loader         function to read image by path, should be thread-safe
+        @max_mb         maximum cache size in MB
+        @max_workers    number of the background threads
+    """
+    def __init__(self, loader, max_mb=256, max_workers=2):
+        super().__init__(max_mb=max_mb)
+        self._loader = loader
+        self._pending = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _load(self, path):
+        try:
+            return self.put(path, self._loader(path))
+        finally:
+            with self._lock:
+                self._pending.pop(path, None)
+
+    def get(self, path):
+        """return the cached result or wait for the loading one"""
+        with self._lock:
+            value = super().get(path)
+            future = self._pending.get(path)
+        if value is not None:
+            return value
+        elif future is not None:
+            return future.result()
+        return self._load(path)
+
+    def prefetch(self, paths):
+        """load the given paths in background if not in cache"""
+        with self._lock:
+            for path in paths:
+                if path in self._entries or path in self._pending:
+                    continue
+                self._pending[path] = self._executor.submit(self._load, path)
+
+class FloodfillCache(LRUCache):
+    """
+    Memoize ImageCV.run_floodfill keyed by (image hash, threshold, iter_blur),
+    keep the result in memory and optionally in cache_dir as png
+
+    Argument
+        @max_mb     maximum memory cache size in MB
+        @cache_dir  directory of the disk cache, None to disable
+    """
+    def __init__(self, max_mb=256, cache_dir=None):
+        super().__init__(max_mb=max_mb)
+        self.cache_dir = cache_dir
+        if cache_dir is not None and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+    @staticmethod
+    def image_hash(image):
+        sha1 = hashlib.sha1(str((image.shape, image.dtype.str)).encode())
+        sha1.update(np.ascontiguousarray(image).data)
+        return sha1.hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, '{}_{}_{}.png'.format(*key))
+
+    def run(self, image, threshold=0.9, iter_blur=5, **kwargs):
+        """the same as ImageCV.run_floodfill but return the cached result if any"""
+        key = (self.image_hash(image), repr(float(threshold)), int(iter_blur))
+        key += tuple('{}={}'.format(k, v) for k, v in sorted(kwargs.items()))
+        result = LRUCache.get(self, key)
+
+        if result is None and self.cache_dir is not None and os.path.exists(self._disk_path(key)):
+            result = cv2.imread(self._disk_path(key), cv2.IMREAD_UNCHANGED)
+            if result is not None and result.shape == image.shape:
+                LOGGER.debug('Load floodfill result from {}'.format(self._disk_path(key)))
+                self.put(key, result)
+            else:
+                result = None
+
+        if result is None:
+            result = ImageCV.run_floodfill(image, threshold, iter_blur, **kwargs)
+            self.put(key, result)
+            if self.cache_dir is not None:
+                cv2.imwrite(self._disk_path(key), result)
+        else:
+            LOGGER.info('Floodfill cache hit - threshold={}, iter_blur={}'.format(threshold, iter_blur))
+
+        return result.copy()
+
+# shared by all applications, set MOTH_FLOODFILL_CACHE to enable the disk cache
+floodfill_cache = FloodfillCache(cache_dir=os.environ.get('MOTH_FLOODFILL_CACHE'))
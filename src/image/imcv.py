@@ -7,12 +7,17 @@ import time
 
 import numpy as np
 import cv2
-from skimage import measure
+from PIL import Image
 
 sys.path.append('../..')
+from src.image.imnp import ImageNP
 from src.support.profiling import func_profiling
 
 LOGGER = logging.getLogger(__name__)
+IMREAD_REDUCED = ((8, cv2.IMREAD_REDUCED_COLOR_8),
+                  (4, cv2.IMREAD_REDUCED_COLOR_4),
+                  (2, cv2.IMREAD_REDUCED_COLOR_2))
+FLOODFILL_GRADIENT = ['color', 'luminance', 'max']
 
 class ImageCV(object):
     def __init__(self):
@@ -32,6 +37,48 @@ class ImageCV(object):
         img = cv2.Canny(img, threshold1, threshold2)
         return img
 
+    @staticmethod
+    def read_image_size(image_path):
+        """read (h, w) from the image header and consider the EXIF orientation"""
+        with Image.open(image_path) as img:
+            w, h = img.size
+            try:
+                orientation = img.getexif().get(0x0112, 1)
+            except Exception:
+                orientation = 1
+        if orientation in (5, 6, 7, 8):
+            w, h = h, w
+        return h, w
+
+    @staticmethod
+    @func_profiling
+    def read_display_image(image_path, target_h):
+        """
+        decode the image with the largest cv2.IMREAD_REDUCED_COLOR_* factor
+        which still not smaller than target_h, then resize to target_h,
+        return the resized image and the original (h, w)
+        """
+        try:
+            image_h, image_w = ImageCV.read_image_size(image_path)
+            flag = cv2.IMREAD_COLOR
+            for factor, reduced_flag in IMREAD_REDUCED:
+                if image_h // factor >= target_h:
+                    flag = reduced_flag
+                    break
+            img = cv2.imread(image_path, flag)
+        except Exception as e:
+            LOGGER.warning('Cannot read header of {} - {}'.format(image_path, e))
+            img = cv2.imread(image_path)
+            image_h, image_w = img.shape[:2]
+
+        resize_h = int(target_h)
+        resize_w = int((resize_h / image_h) * image_w)
+        img = cv2.resize(img, (resize_w, resize_h), interpolation=cv2.INTER_AREA)
+        LOGGER.info('resize image from {}x{} to {}x{}'.format(
+            image_w, image_h, resize_w, resize_h
+        ))
+        return img, (image_h, image_w)
+
     @staticmethod
     @func_profiling
     def generate_error_mask(image, gamma=0.22):
@@ -78,6 +125,22 @@ class ImageCV(object):
         cond_sequence = sorted(cond_sequence, key=lambda x: x[1], reverse=True)
         return np.where(output[1] == cond_sequence[nth-1][0])
 
+    @staticmethod
+    def connected_component_stats(binary, connectivity=8):
+        """
+        label the connected components and get the stats of all in one pass,
+        return (count, labels, stats, centroids) and label 0 is the background
+        """
+        return cv2.connectedComponentsWithStats(binary, connectivity=connectivity, ltype=cv2.CV_32S)
+
+    @staticmethod
+    def largest_connected_component(binary, connectivity=8):
+        """return the labels and the label of largest component, -1 if no component"""
+        count, labels, stats, centroids = ImageCV.connected_component_stats(binary, connectivity)
+        if count <= 1:
+            return labels, -1
+        return labels, 1 + int(np.argmax(stats[1:, cv2.CC_STAT_AREA]))
+
     @staticmethod
     def show_image_by_cv2(image, exit_code=27):
         """show image by cv2"""
@@ -90,33 +153,63 @@ class ImageCV(object):
                 break
         cv2.destroyAllWindows()
 
-    # image preprocess: get the object by difference
+    # image preprocess: get the gradient magnitude for floodfill
     @staticmethod
     @func_profiling
-    def run_floodfill(image, threshold=0.9, iter_blur=5):
-        if not isinstance(threshold, float) or not isinstance(iter_blur, int):
-            LOGGER.error('threshold = {}, iter_count = {}'.format(threshold, iter_blur))
-            raise ValueError('threshold should be in the range 0 ~ 1 and iter_blur is int')
-        LOGGER.info('Running floodfill algorithm - threshold={}, iter_blur={}'.format(
-            threshold, iter_blur
-        ))
-        original_image = image.copy()
+    def floodfill_gradient(image, gradient='color'):
+        """
+        return the uint8 gradient magnitude normalized to 0 ~ 255
+            color       magnitude of each BGR channel, 3 channels (original)
+            luminance   magnitude of the gray image, single channel
+            max         magnitude of the maximum of BGR channels, single channel
+        """
+        if gradient not in FLOODFILL_GRADIENT:
+            raise ValueError('gradient should be one of {}'.format(FLOODFILL_GRADIENT))
 
-        # get the magnitude
-        img_float32 = original_image.astype('float32') / 255.0
-        img_gradient_x = cv2.Sobel(img_float32, cv2.CV_32F, 1, 0, ksize=1)
-        img_gradient_y = cv2.Sobel(img_float32, cv2.CV_32F, 0, 1, ksize=1)
-        mag, angle = cv2.cartToPolar(img_gradient_x, img_gradient_y, angleInDegrees=True)
+        if gradient == 'color':
+            img_float32 = image.astype('float32') / 255.0
+            img_gradient_x = cv2.Sobel(img_float32, cv2.CV_32F, 1, 0, ksize=1)
+            img_gradient_y = cv2.Sobel(img_float32, cv2.CV_32F, 0, 1, ksize=1)
+            mag, angle = cv2.cartToPolar(img_gradient_x, img_gradient_y, angleInDegrees=True)
 
-        # normalize
-        mag += max(-mag.min(), 0)
-        mag /= mag.max()
-        mag *= 255
-        image = mag.astype('uint8')
+            # normalize
+            mag += max(-mag.min(), 0)
+            mag /= mag.max()
+            mag *= 255
+            return mag.astype('uint8')
+
+        # single channel source, no float copy of the image
+        if image.ndim == 2:
+            src = image
+        elif gradient == 'luminance':
+            src = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        else:
+            src = cv2.max(cv2.max(image[:, :, 0], image[:, :, 1]), image[:, :, 2])
+
+        # magnitude without angle, reuse the buffer of x gradient
+        grad_x = np.empty(src.shape, dtype='float32')
+        grad_y = np.empty(src.shape, dtype='float32')
+        cv2.Sobel(src, cv2.CV_32F, 1, 0, dst=grad_x, ksize=1)
+        cv2.Sobel(src, cv2.CV_32F, 0, 1, dst=grad_y, ksize=1)
+        mag = cv2.magnitude(grad_x, grad_y, grad_x)
+
+        # normalize into the uint8 buffer of source shape
+        max_val = float(mag.max())
+        out = np.empty(src.shape, dtype='uint8')
+        cv2.convertScaleAbs(mag, out, 255.0 / max_val if max_val > 0 else 0)
+        return out
+
+    # image preprocess: get the mask of the object
+    @staticmethod
+    @func_profiling
+    def floodfill_mask(image, threshold=0.9, iter_blur=5, gradient='color'):
+        """return the boolean mask of the largest object surrounded by gradient edges"""
+        image = ImageCV.floodfill_gradient(image, gradient)
 
         # binary threshold
-        threshold_value = np.sort(image, axis=None)[int(image.size*threshold)]
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        threshold_value = ImageNP.sorted_value(image, threshold)
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         ret, image = cv2.threshold(image, threshold_value, 255, cv2.THRESH_BINARY)
 
         # floodfill and reverse
@@ -133,18 +226,65 @@ class ImageCV(object):
         for i in range(iter_blur):
             img_out = cv2.medianBlur(img_out, 3)
 
-        # Label connected regions of an integer array. (2-connectivity)
-        labels = measure.label(img_out, neighbors=8, background=0)
-        mask = [0, -1]
-        for label in np.unique(labels):
-            # background
-            if label == 0:
-                continue
+        # Label connected regions and get the largest one. (8-connectivity)
+        labels, largest_label = ImageCV.largest_connected_component(img_out, connectivity=8)
+        return labels == largest_label
+
+    # image preprocess: get the coarse object region on the downsampled image
+    @staticmethod
+    @func_profiling
+    def floodfill_roi(image, threshold=0.9, iter_blur=5, gradient='color', max_side=512, padding=0.05):
+        """
+        return the padded bounding box (x, y, w, h) of the strong edges in original image,
+        use all denoised edges rather than the largest object so that the roi won't cut the object
+        """
+        h, w = image.shape[:2]
+        scale = min(1.0, max_side / max(h, w))
+        small_w, small_h = max(int(w*scale), 1), max(int(h*scale), 1)
+        small = cv2.resize(image, (small_w, small_h), interpolation=cv2.INTER_AREA)
+        small = ImageCV.floodfill_gradient(small, gradient)
+        threshold_value = ImageNP.sorted_value(small, threshold)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        ret, small = cv2.threshold(small, threshold_value, 255, cv2.THRESH_BINARY)
+        for i in range(iter_blur):
+            small = cv2.medianBlur(small, 3)
+        if not small.any():
+            return (0, 0, w, h)
+
+        # map back to original image and pad with the background border
+        x, y, rect_w, rect_h = cv2.boundingRect(small)
+        pad = int(max(h, w) * padding) + int(np.ceil(1 / scale))
+        x1, y1 = max(int(x / scale) - pad, 0), max(int(y / scale) - pad, 0)
+        x2 = min(int(np.ceil((x+rect_w) / scale)) + pad, w)
+        y2 = min(int(np.ceil((y+rect_h) / scale)) + pad, h)
+        return (x1, y1, x2-x1, y2-y1)
+
+    # image preprocess: get the object by difference
+    @staticmethod
+    @func_profiling
+    def run_floodfill(image, threshold=0.9, iter_blur=5, gradient='color', roi=False):
+        if not isinstance(threshold, float) or not isinstance(iter_blur, int):
+            LOGGER.error('threshold = {}, iter_count = {}'.format(threshold, iter_blur))
+            raise ValueError('threshold should be in the range 0 ~ 1 and iter_blur is int')
+        LOGGER.info('Running floodfill algorithm - threshold={}, iter_blur={}, gradient={}'.format(
+            threshold, iter_blur, gradient
+        ))
+        original_image = image.copy()
 
-            object_area = (labels == label).sum()
-            if object_area > mask[0]:
-                mask[0] = object_area
-                mask[1] = label
+        if roi:
+            # only process the padded object region in original resolution,
+            # keep the same count of edge pixels as the threshold ratio of full image
+            h, w = image.shape[:2]
+            x, y, roi_w, roi_h = ImageCV.floodfill_roi(image, threshold, iter_blur, gradient)
+            roi_threshold = 1 - (1-threshold) * (h*w) / (roi_h*roi_w)
+            roi_threshold = min(max(roi_threshold, 0.0), threshold)
+            LOGGER.info('Floodfill in roi {} with threshold={:.4f}'.format((x, y, roi_w, roi_h), roi_threshold))
+            object_mask = np.zeros((h, w), dtype='bool')
+            object_mask[y:y+roi_h, x:x+roi_w] = ImageCV.floodfill_mask(
+                image[y:y+roi_h, x:x+roi_w], roi_threshold, iter_blur, gradient)
+        else:
+            object_mask = ImageCV.floodfill_mask(image, threshold, iter_blur, gradient)
 
         # set background
         '''
@@ -156,5 +296,5 @@ class ImageCV(object):
                                       original_image[:, :, 1], alpha))
             return output_image
         '''
-        original_image[labels != mask[1]] = 255
+        original_image[~object_mask] = 255
         return original_image
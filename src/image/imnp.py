@@ -3,9 +3,10 @@ Using Numpy to handle the Image operation
 """
 import logging
 import sys
+from functools import lru_cache
 
+import cv2
 import numpy as np
-from scipy.spatial.distance import cosine
 
 sys.path.append('../..')
 from src.support.profiling import func_profiling
@@ -17,53 +18,188 @@ class ImageNP(object):
         super().__init__()
 
     @staticmethod
-    @func_profiling
+    @lru_cache(maxsize=32)
     def generate_checkboard(shape, block_size=10, color=125):
-        """generate transparents-like background"""
-        im = np.zeros(shape) * 255
+        """generate transparents-like background, cached by arguments and read-only"""
+        rows, cols = np.indices(shape[:2], sparse=True)
+        board = np.equal(rows//block_size % 2, cols//block_size % 2).view('uint8')
+        board *= np.uint8(color)
+        if len(shape) == 3:
+            board = np.repeat(board[:, :, np.newaxis], shape[2], axis=2)
+        board.setflags(write=False)
+        return board
+
+    @staticmethod
+    def mirror_similarity(image):
+        """
+        cosine similarity of the left part and the mirrored right part for every axis x,
+        axis x pairs column x-1-k with column x+k (the same as the halves of min(x, w-x) columns),
+        all dot products come from a single FFT self-convolution of the rows
+        """
+        image = np.asarray(image, dtype='float64')
+        h, w = image.shape
+        spectrum = np.fft.rfft(image, n=2*w, axis=1)
+        conv = np.fft.irfft((spectrum*spectrum).sum(axis=0), n=2*w)
 
-        for i in range(block_size):
-            for j in range(block_size):
-                im[i::block_size*2, j::block_size*2] = color
-                im[i+block_size::block_size*2, j+block_size::block_size*2] = color
+        # the energy of both halves from the cumulative column energy
+        energy = np.concatenate(([0], np.cumsum(np.einsum('ij,ij->j', image, image))))
+        xs = np.arange(1, w)
+        half = np.minimum(xs, w-xs)
+        left, right = energy[xs]-energy[xs-half], energy[xs+half]-energy[xs]
 
-        return im
+        similarity = np.zeros(w)
+        norm = np.sqrt(left*right)
+        valid = norm > 0
+        similarity[1:][valid] = conv[2*xs-1][valid] / 2 / norm[valid]
+        return similarity
 
     @staticmethod
     @func_profiling
-    def generate_symmetric_line(image, interval=10):
-        """generate symmetric line of image"""
-        try:
-            h, w, channel = image.shape
-        except Exception as identifier:
-            LOGGER.error(identifier)
+    def generate_symmetric_line(image, band=0.25, max_width=128):
+        """
+        generate symmetric line of image by maximizing the mirror similarity,
+        search the axis in the central band on the coarsest pyramid level
+        and refine it level by level without copying the flipped halves
+        """
+        if image is None or image.ndim not in (2, 3):
+            LOGGER.error('Invalid image to generate symmetric line')
             return
-        line_x = int(w/2)
-        approach_x = [line_x]
+        h, w = image.shape[:2]
 
-        while True:
+        # white background as zero so that the object dominates the similarity
+        pyramid = ImageNP.inverted_pyramid(image, max_width)
+
+        coarse = pyramid[-1]
+        similarity = ImageNP.mirror_similarity(coarse)
+        lower = max(int(coarse.shape[1] * (0.5-band)), 1)
+        upper = max(int(np.ceil(coarse.shape[1] * (0.5+band))), lower+1)
+        line_x = lower + int(np.argmax(similarity[lower:upper]))
+
+        for level in reversed(pyramid[:-1]):
+            level_w = level.shape[1]
+            energy = np.concatenate(([0], np.cumsum(np.einsum('ij,ij->j', level, level))))
             max_similarity = None
 
-            for x in range(line_x-interval, line_x+interval):
-                min_w = min(x, w-x)
-                sim = cosine(
-                   image[0:h, x-min_w:x].flatten(),
-                    np.fliplr(image[0:h, x:x+min_w].copy()).flatten())
+            for x in range(max(line_x*2-2, 1), min(line_x*2+3, level_w)):
+                min_w = min(x, level_w-x)
+                dot = np.einsum('ij,ij->', level[:, x-min_w:x], level[:, x:x+min_w][:, ::-1])
+                norm = np.sqrt((energy[x]-energy[x-min_w]) * (energy[x+min_w]-energy[x]))
+                sim = dot / norm if norm > 0 else 0
 
-                if max_similarity is None:
-                    max_similarity = (x, sim)
-                elif sim > max_similarity[1]:
+                if max_similarity is None or sim > max_similarity[1]:
                     max_similarity = (x, sim)
 
-            if max_similarity[0] == line_x:
-                break
-            else:
-                line_x = max_similarity[0]
+            line_x = max_similarity[0]
 
         line_ptxs = ((line_x, 0), (line_x, h))
         LOGGER.debug('Generate symmetric line {}'.format(line_ptxs))
         return line_ptxs
 
+    @staticmethod
+    def inverted_pyramid(image, max_width=128):
+        """grayscale pyramid with white background as zero until the width is under max_width"""
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        pyramid = [255 - gray.astype('float32')]
+        while pyramid[-1].shape[1] > max_width and min(pyramid[-1].shape) > 1:
+            pyramid.append(cv2.pyrDown(pyramid[-1]))
+        return pyramid
+
+    @staticmethod
+    def parabolic_peak(values, index):
+        """sub-sample offset of the peak by fitting a parabola to its neighbors"""
+        if 0 < index < len(values)-1:
+            left, center, right = values[index-1], values[index], values[index+1]
+            denom = left - 2*center + right
+            if denom < 0:
+                return float(np.clip(0.5 * (left-right) / denom, -0.5, 0.5))
+        return 0.0
+
+    @staticmethod
+    def _axis_similarity(image, center, angle):
+        """rotate the image about center to let the axis of angle be vertical, return the similarity of each x"""
+        theta = np.deg2rad(angle)
+        rotation = np.array([[np.cos(theta), -np.sin(theta)], [np.sin(theta), np.cos(theta)]])
+        M = np.hstack((rotation, (np.array(center) - rotation.dot(center)).reshape(2, 1)))
+        h, w = image.shape
+        rotated = cv2.warpAffine(image, M, (w, h), flags=cv2.INTER_LINEAR, borderValue=0)
+        return ImageNP.mirror_similarity(rotated)
+
+    @staticmethod
+    @func_profiling
+    def generate_symmetric_axis(image, max_angle=15, angle_step=1, band=0.25, max_width=128, refine_width=512):
+        """
+        estimate the symmetry axis with small tilt, search the angle and offset on the coarse image
+        rotated about its centroid, then refine both in sub-pixel by parabolic interpolation
+
+        return (center, angle, confidence)
+            center      (x, y) on the axis at the height of the centroid in original image
+            angle       degree of the axis from vertical, positive when the bottom tilts to the right
+            confidence  mirror cosine similarity of the axis in [0, 1]
+        """
+        if image is None or image.ndim not in (2, 3):
+            LOGGER.error('Invalid image to generate symmetric axis')
+            return
+        h, w = image.shape[:2]
+        pyramid = ImageNP.inverted_pyramid(image, max_width)
+        refine_level = next(i for i, level in enumerate(pyramid) if level.shape[1] <= refine_width)
+        coarse_level = len(pyramid) - 1
+        # pyrDown keeps pixel i of a level at pixel 2i of the level above
+        to_upper = lambda v, levels: v * 2**levels
+
+        # coarse search over angles about the centroid
+        coarse = pyramid[-1]
+        moments = cv2.moments(coarse)
+        if moments['m00'] <= 0:
+            LOGGER.warning('Empty image to generate symmetric axis')
+            return ((w/2, h/2), 0.0, 0.0)
+        center = (moments['m10']/moments['m00'], moments['m01']/moments['m00'])
+        lower = max(int(center[0] - band*coarse.shape[1]), 1)
+        upper = max(int(np.ceil(center[0] + band*coarse.shape[1])), lower+1)
+
+        angles = np.arange(-max_angle, max_angle+angle_step/2, angle_step)
+        scores, offsets = [], []
+        for angle in angles:
+            similarity = ImageNP._axis_similarity(coarse, center, angle)[lower:upper]
+            offsets.append(lower + int(np.argmax(similarity)))
+            scores.append(similarity.max())
+        best = int(np.argmax(scores))
+        angle = float(angles[best] + angle_step * ImageNP.parabolic_peak(scores, best))
+
+        # refine the offset on the finer level with the sub-pixel angle
+        fine = pyramid[refine_level]
+        fine_w = fine.shape[1]
+        fine_center = tuple(to_upper(v, coarse_level-refine_level) for v in center)
+        fine_x = int(round(to_upper(offsets[best], coarse_level-refine_level)))
+        radius = int(np.ceil(fine_w / coarse.shape[1])) + 1
+        similarity = ImageNP._axis_similarity(fine, fine_center, angle)
+        lower, upper = max(fine_x-radius, 1), min(fine_x+radius+1, fine_w)
+        line_x = lower + int(np.argmax(similarity[lower:upper]))
+        confidence = float(np.clip(similarity[line_x], 0, 1))
+
+        # the axis lies between column line_x-1 and line_x of the rotated image,
+        # rotate back about the centroid and move along the axis to the height of the centroid
+        theta = np.deg2rad(angle)
+        dx = line_x - 0.5 + ImageNP.parabolic_peak(similarity, line_x) - fine_center[0]
+        axis_x = fine_center[0] + dx*np.cos(theta) + dx*np.sin(theta)*np.tan(theta)
+        axis_center = (to_upper(axis_x, refine_level), to_upper(fine_center[1], refine_level))
+
+        LOGGER.debug('Generate symmetric axis center={}, angle={:.2f}, confidence={:.3f}'.format(
+            axis_center, angle, confidence))
+        return (axis_center, angle, confidence)
+
+    @staticmethod
+    def sorted_value(arr, ratio):
+        """
+        the same as np.sort(arr, axis=None)[int(arr.size*ratio)] in linear time,
+        uint8 by the cumulative sum of 256-bin histogram, others by np.partition
+        """
+        arr = np.asarray(arr)
+        k = min(max(int(arr.size*ratio), 0), arr.size-1)
+        if arr.dtype == np.uint8:
+            cumsum = np.cumsum(np.bincount(arr.ravel(), minlength=256))
+            return arr.dtype.type(np.searchsorted(cumsum, k, side='right'))
+        return np.partition(arr, k, axis=None)[k]
+
     @staticmethod
     @func_profiling
     def shift_matrix(x, y, mat, threshold=255):
@@ -0,0 +1,123 @@
+"""
+track.py
+    [class] Track: a stroke of (x, y) points backed by a growable int32 buffer
+    [class] TrackGroup: a list of Track for multiple strokes
+"""
+import logging
+
+import cv2
+import numpy as np
+
+LOGGER = logging.getLogger(__name__)
+
+class Track(object):
+    """
+    Record the mouse track as a (N, 2) int32 array without reallocating
+    on every point, and draw it with a single cv2.polylines call
+
+    Argument
+        @points     initial (x, y) points
+        @capacity   initial buffer capacity
+    """
+    def __init__(self, points=None, capacity=256):
+        super().__init__()
+        self._buffer = np.empty((max(int(capacity), 2), 2), dtype='int32')
+        self._length = 0
+        if points is not None:
+            self.extend(points)
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        return (tuple(ptx) for ptx in self.points.tolist())
+
+    def __getitem__(self, index):
+        ptx = self.points[index]
+        if ptx.ndim == 1:
+            return tuple(int(i) for i in ptx)
+        return ptx
+
+    def __repr__(self):
+        return 'Track(length={})'.format(self._length)
+
+    @property
+    def points(self):
+        """(N, 2) int32 view of the recorded points"""
+        return self._buffer[:self._length]
+
+    @property
+    def xs(self):
+        return self.points[:, 0]
+
+    @property
+    def ys(self):
+        return self.points[:, 1]
+
+    def _reserve(self, size):
+        if size > self._buffer.shape[0]:
+            capacity = max(size, self._buffer.shape[0]*2)
+            buffer = np.empty((capacity, 2), dtype='int32')
+            buffer[:self._length] = self.points
+            self._buffer = buffer
+
+    def append(self, ptx):
+        self._reserve(self._length+1)
+        self._buffer[self._length] = ptx[0], ptx[1]
+        self._length += 1
+
+    def extend(self, ptxs):
+        ptxs = np.asarray(ptxs, dtype='int32').reshape(-1, 2)
+        self._reserve(self._length+len(ptxs))
+        self._buffer[self._length:self._length+len(ptxs)] = ptxs
+        self._length += len(ptxs)
+
+    def clear(self):
+        self._length = 0
+
+    def scale(self, ratio_x, ratio_y=None):
+        """return a new track which points are scaled by given ratio"""
+        ratio_y = ratio_x if ratio_y is None else ratio_y
+        ptxs = self.points.astype('float64') * (ratio_x, ratio_y)
+        return Track(np.round(ptxs), capacity=len(self))
+
+    def simplify(self, epsilon=1.0):
+        """
+        Ramer-Douglas-Peucker decimation in place,
+        cv2.approxPolyDP keeps both end points of the open curve
+        """
+        if epsilon <= 0 or self._length < 3:
+            return self
+        before = self._length
+        approx = cv2.approxPolyDP(self.points.reshape(-1, 1, 2), epsilon, False)
+        self._length = 0
+        self.extend(approx)
+        LOGGER.debug('Simplify track from {} to {} points'.format(before, self._length))
+        return self
+
+    def draw(self, img, color=(255, 255, 255), thickness=2):
+        if self._length > 1:
+            cv2.polylines(img, [self.points.reshape(-1, 1, 2)], False, color, thickness)
+        return img
+
+    def to_list(self):
+        return self.points.tolist()
+
+    @classmethod
+    def from_list(cls, ptxs):
+        return cls(ptxs if ptxs else None)
+
+class TrackGroup(list):
+    """a list of Track, e.g. multiple eliminate strokes"""
+    def draw(self, img, color=(255, 255, 255), thickness=2):
+        polylines = [t.points.reshape(-1, 1, 2) for t in self if len(t) > 1]
+        if polylines:
+            cv2.polylines(img, polylines, False, color, thickness)
+        return img
+
+    def to_list(self):
+        return [t.to_list() for t in self]
+
+    @classmethod
+    def from_list(cls, tracks):
+        return cls(Track.from_list(t) for t in tracks or [])
@@ -0,0 +1,62 @@
+"""
+warp.py
+    [class] InverseWarp: warp the masked pixels only by a precomputed gather
+"""
+import logging
+
+import cv2
+import numpy as np
+
+LOGGER = logging.getLogger(__name__)
+
+class InverseWarp(object):
+    """
+    Map the masked destination pixels back to the source by the inverse homography once,
+    precompute the 4 source indices and bilinear weights of each pixel,
+    so that warping a frame is a single gather instead of cv2.warpPerspective
+
+    Argument
+        @M          transform matrix from source to destination
+        @mask       destination mask, only the nonzero pixels are mapped
+        @src_shape  shape of the source frame
+    """
+    def __init__(self, M, mask, src_shape):
+        self.dst_shape = mask.shape[:2]
+        self.src_shape = src_shape[:2]
+        src_h, src_w = self.src_shape
+
+        ys, xs = np.nonzero(mask)
+        self.dst_index = ys * self.dst_shape[1] + xs
+        points = np.stack((xs, ys), axis=1).astype('float64').reshape(-1, 1, 2)
+        if len(points):
+            points = cv2.perspectiveTransform(points, np.linalg.inv(M))
+        points = points.reshape(-1, 2)
+        finite = np.isfinite(points).all(axis=1)
+        points[~finite] = -2
+
+        # the 4 neighbors and the bilinear weights, outside pixel is zero as BORDER_CONSTANT
+        x0 = np.floor(points[:, 0]).astype('int64')
+        y0 = np.floor(points[:, 1]).astype('int64')
+        fx, fy = points[:, 0] - x0, points[:, 1] - y0
+        nx = np.stack((x0, x0+1, x0, x0+1), axis=1)
+        ny = np.stack((y0, y0, y0+1, y0+1), axis=1)
+        weight = np.stack(((1-fx)*(1-fy), fx*(1-fy), (1-fx)*fy, fx*fy), axis=1)
+        inside = (nx >= 0) & (nx < src_w) & (ny >= 0) & (ny < src_h)
+        self.weight = np.where(inside, weight, 0)
+        self.src_index = np.clip(ny, 0, src_h-1) * src_w + np.clip(nx, 0, src_w-1)
+
+    def gather(self, frame):
+        """values of the masked destination pixels in order of np.nonzero(mask)"""
+        flat = frame.reshape(self.src_shape[0]*self.src_shape[1], -1)
+        values = np.einsum('nk,nkc->nc', self.weight, flat[self.src_index])
+        return values if frame.ndim == 3 else values[:, 0]
+
+    def warp(self, frame):
+        """the same as cv2.warpPerspective but only the masked pixels, others are zero"""
+        channel = frame.shape[2:]
+        values = self.gather(frame)
+        if np.issubdtype(frame.dtype, np.integer):
+            values = np.rint(values)
+        result = np.zeros(self.dst_shape + channel, dtype=frame.dtype)
+        result.reshape((-1,) + channel)[self.dst_index] = values
+        return result
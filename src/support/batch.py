@@ -0,0 +1,69 @@
+"""
+Support function for the headless batch commands
+"""
+
+import os
+import glob
+import json
+import logging
+
+
+LOGGER = logging.getLogger(__name__)
+
+IMAGE_EXT = ['jpg', 'jpeg', 'png']
+
+def is_image(path, ext=IMAGE_EXT):
+    return os.path.splitext(path)[1][1:].lower() in ext
+
+def collect_images(images=[], recursive=[], ext=IMAGE_EXT):
+    """
+    collect the absolute image paths in given order without duplication
+    @images     image paths, glob patterns or directories (not recursive)
+    @recursive  directories to search recursively
+    """
+    paths = []
+
+    for image in images:
+        if os.path.isdir(image):
+            paths += sorted(glob.glob(os.path.join(image, '*')))
+        elif glob.has_magic(image):
+            paths += sorted(glob.glob(image, recursive=True))
+        elif os.path.exists(image):
+            paths.append(image)
+        else:
+            LOGGER.warning('Input {} not found'.format(image))
+
+    for repo in recursive:
+        paths += sorted(glob.glob(os.path.join(repo, '**', '*'), recursive=True))
+
+    collected, seen = [], set()
+    for path in paths:
+        path = os.path.abspath(path)
+        if path not in seen and os.path.isfile(path) and is_image(path, ext):
+            seen.add(path)
+            collected.append(path)
+    return collected
+
+def params_path(dst_path):
+    """sidecar json of the parameters which the output is made by"""
+    return '{}.json'.format(os.path.splitext(dst_path)[0])
+
+def save_params(dst_path, params):
+    with open(params_path(dst_path), 'w') as f:
+        json.dump(params, f, indent=2, sort_keys=True)
+
+def load_params(dst_path):
+    try:
+        with open(params_path(dst_path), 'r') as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return None
+
+def is_up_to_date(src_path, dst_path, params=None):
+    """
+    the output is up to date if it is newer than the input,
+    and made by the same parameters if params is given
+    """
+    if not os.path.exists(dst_path) or os.path.getmtime(dst_path) < os.path.getmtime(src_path):
+        return False
+    return params is None or load_params(dst_path) == params
@@ -0,0 +1,88 @@
+"""
+Pixel-to-millimetre calibration by the scale bar under the "10 mm" label,
+recorded in the calibration field of the specimen metadata
+"""
+
+import os
+import json
+import time
+import logging
+
+import cv2
+import numpy as np
+
+
+LOGGER = logging.getLogger(__name__)
+
+SCALE_BAR_MM = 10
+COMPONENT_PARTS = ('fl', 'fr', 'bl', 'br', 'body')
+
+def metadata_path(photo):
+    """the same directory as GraphCutAction saves the components"""
+    return os.path.join(os.path.splitext(photo)[0], 'metadata.json')
+
+def find_scale_bar(label_rect, rects, min_aspect=4):
+    """the widest flat rectangle below the label which overlaps the label horizontally"""
+    x, y, w, h = label_rect
+    candidates = [
+        (_x, _y, _w, _h) for _x, _y, _w, _h in rects
+        if _w >= min_aspect*_h and _y >= y + h//2 and _x < x+w and _x+_w > x
+    ]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda rect: rect[2])
+
+def measure(metadata, px_per_mm):
+    """
+    body width in mm and the area of each part in mm^2,
+    only the metadata exported in original resolution (with image.resize) is measurable
+    """
+    image_meta = metadata.get('image') or {}
+    if not px_per_mm or 'resize' not in image_meta:
+        return {'body_width_mm': None, 'area_mm2': None}
+
+    body_width = image_meta.get('body_width')
+    area_mm2 = {}
+    for part in COMPONENT_PARTS:
+        # cnts is the (ys, xs) coordinate lists of the contour by ImageNP.contour_to_coor
+        cnts = (metadata.get(part) or {}).get('cnts')
+        if not cnts or not len(cnts[0]):
+            area_mm2[part] = None
+            continue
+        ys, xs = cnts
+        points = np.stack((xs, ys), axis=1).astype('float32').reshape(-1, 1, 2)
+        area_mm2[part] = round(cv2.contourArea(points) / px_per_mm**2, 4)
+
+    return {
+        'body_width_mm': None if body_width is None else round(body_width / px_per_mm, 4),
+        'area_mm2': area_mm2
+    }
+
+def make_calibration(label_rect, bar_rect, score, template, bar_mm=SCALE_BAR_MM):
+    """calibration in the original resolution of the photo"""
+    return {
+        'px_per_mm': round(bar_rect[2] / bar_mm, 4),
+        'scale_bar': [int(i) for i in bar_rect],
+        'scale_label': [int(i) for i in label_rect],
+        'scale_bar_mm': bar_mm,
+        'score': None if score is None else round(float(score), 4),
+        'template': template,
+        'timestamp': time.ctime()
+    }
+
+def update_metadata(path, calibration):
+    """write the calibration with the measurements into metadata, create it if not exists"""
+    metadata = {}
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            metadata = json.load(f)
+    calibration = dict(calibration)
+    calibration.update(measure(metadata, calibration['px_per_mm']))
+    metadata['calibration'] = calibration
+
+    dirname = os.path.dirname(path)
+    if dirname and not os.path.exists(dirname):
+        os.makedirs(dirname)
+    with open(path, 'w+') as f:
+        json.dump(metadata, f, separators=(',', ':'))
+    return calibration
@@ -0,0 +1,115 @@
+"""
+Read and write the photo-to-thermal transform matrix
+
+The matrix is saved as a versioned json record with its shape, dtype, the source image size,
+the method and the quality score. The legacy .dat (raw float64 by ndarray.tofile) is still readable.
+An index file holds the records of many specimens so that a batch run loads them with one read.
+"""
+
+import os
+import json
+import time
+import logging
+
+import numpy as np
+
+
+LOGGER = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+MATRIX_FILE = 'transform_matrix.json'
+LEGACY_MATRIX_FILE = 'transform_matrix.dat'
+
+def make_record(M, photo_size=None, thermal_size=None, method=None, score=None):
+    """
+    @photo_size     (w, h) of the original photo
+    @thermal_size   (w, h) of the thermal frame
+    @method         strategy of the matrix, e.g. max, ecc or manual
+    @score          IoU of the warped thermal silhouette and the original mask
+    """
+    M = np.asarray(M, dtype='float64')
+    return {
+        'version': FORMAT_VERSION,
+        'shape': list(M.shape),
+        'dtype': str(M.dtype),
+        'matrix': M.tolist(),
+        'photo_size': None if photo_size is None else [int(i) for i in photo_size],
+        'thermal_size': None if thermal_size is None else [int(i) for i in thermal_size],
+        'method': method,
+        'score': None if score is None else float(score),
+        'timestamp': time.strftime('%Y/%m/%d %H:%M:%S')
+    }
+
+def record_to_matrix(record):
+    M = np.array(record['matrix'], dtype=record.get('dtype', 'float64'))
+    return M.reshape(record.get('shape', (3, 3)))
+
+def _write_json(path, content):
+    dirname = os.path.dirname(path)
+    if dirname and not os.path.exists(dirname):
+        os.makedirs(dirname)
+    tmp_path = '{}.tmp'.format(path)
+    with open(tmp_path, 'w') as f:
+        json.dump(content, f, indent=2)
+    os.replace(tmp_path, path)
+
+def save_matrix(path, M, **kwargs):
+    """save the matrix record as json, kwargs are passed to make_record"""
+    record = make_record(M, **kwargs)
+    _write_json(path, record)
+    LOGGER.info('Save transform matrix file - {}'.format(path))
+    return record
+
+def load_record(path):
+    """load the json record, or wrap the legacy raw float64 .dat as a version 0 record"""
+    if os.path.splitext(path)[1].lower() == '.json':
+        with open(path, 'r') as f:
+            record = json.load(f)
+        if 'matrix' not in record:
+            raise ValueError('{} is not a transform matrix record'.format(path))
+        return record
+
+    M = np.fromfile(path, dtype='float64')
+    if M.size != 9:
+        raise ValueError('{} has {} values, expect a 3x3 float64 matrix'.format(path, M.size))
+    record = make_record(M.reshape(3, 3))
+    record['version'] = 0
+    return record
+
+def load_matrix(path):
+    return record_to_matrix(load_record(path))
+
+def find_matrix_path(dirpath):
+    """the json record has priority over the legacy .dat in the specimen directory"""
+    for filename in (MATRIX_FILE, LEGACY_MATRIX_FILE):
+        path = os.path.join(dirpath, filename)
+        if os.path.exists(path):
+            return path
+    return None
+
+def is_index(path):
+    if os.path.splitext(path)[1].lower() != '.json':
+        return False
+    with open(path, 'r') as f:
+        return 'matrices' in json.load(f)
+
+def save_index(path, records):
+    """save the records which map the specimen directory to its matrix record"""
+    _write_json(path, {
+        'version': FORMAT_VERSION,
+        'matrices': {os.path.abspath(k): v for k, v in records.items()}
+    })
+    LOGGER.info('Save {} transform matrix records in index - {}'.format(len(records), path))
+
+def load_index(path):
+    with open(path, 'r') as f:
+        index = json.load(f)
+    return index.get('matrices', {})
+
+def lookup_index(records, dirpath):
+    """find the record by the specimen directory, fallback to the directory name"""
+    dirpath = os.path.abspath(dirpath)
+    if dirpath in records:
+        return records[dirpath]
+    matched = [v for k, v in records.items() if os.path.basename(k) == os.path.basename(dirpath)]
+    return matched[0] if len(matched) == 1 else None
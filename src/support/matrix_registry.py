@@ -0,0 +1,70 @@
+"""
+Registry of the accepted photo-to-thermal transform matrix,
+the specimens photographed on the same rig share nearly the same homography
+"""
+
+import os
+import json
+import time
+import logging
+
+import numpy as np
+
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_REGISTRY = os.path.join(os.path.expanduser('~'), '.moth-graphcut', 'matrix_registry.json')
+
+class MatrixRegistry(object):
+    """
+    Argument
+        @path   json file which maps the rig key to the last accepted matrix
+    """
+    def __init__(self, path=DEFAULT_REGISTRY):
+        self.path = path
+        self._records = self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (IOError, ValueError) as e:
+            LOGGER.warning('Cannot load matrix registry {} - {}'.format(self.path, e))
+            return {}
+
+    @staticmethod
+    def key(photo_shape, thermal_shape, rig=None):
+        """key by the rig id and the image size (w x h) of photo and thermal frame"""
+        return '{}|{}x{}|{}x{}'.format(
+            rig or 'default', photo_shape[1], photo_shape[0], thermal_shape[1], thermal_shape[0]
+        )
+
+    def get(self, key):
+        record = self._records.get(key)
+        if record is None:
+            return None
+        return np.array(record['matrix'], dtype='float64').reshape(3, 3)
+
+    def register(self, key, M, score=None, method=None):
+        """store the accepted matrix as the initial estimate of the same rig"""
+        if M is None or not np.isfinite(M).all():
+            LOGGER.warning('Skip registering invalid matrix for {}'.format(key))
+            return
+        self._records = self._load()
+        self._records[key] = {
+            'matrix': np.asarray(M, dtype='float64').reshape(3, 3).tolist(),
+            'score': None if score is None else float(score),
+            'method': method,
+            'timestamp': time.strftime('%Y/%m/%d %H:%M:%S')
+        }
+
+        dirname = os.path.dirname(self.path)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname)
+        tmp_path = '{}.tmp'.format(self.path)
+        with open(tmp_path, 'w') as f:
+            json.dump(self._records, f, indent=2)
+        os.replace(tmp_path, self.path)
+        LOGGER.info('Register transform matrix of {} in {}'.format(key, self.path))
@@ -0,0 +1,62 @@
+"""
+Observable state for the tkinter viewers,
+notify the owner by owner.request_sync() when the state changes
+"""
+import logging
+
+LOGGER = logging.getLogger(__name__)
+
+def notify(owner):
+    request_sync = getattr(owner, 'request_sync', None)
+    if request_sync is not None:
+        request_sync()
+
+class ObservableList(list):
+    """list which calls the callback after every in-place mutation"""
+    def __init__(self, iterable=(), callback=None):
+        super().__init__(iterable)
+        self.callback = callback
+
+    def _changed(self):
+        if self.callback is not None:
+            self.callback()
+
+def _mutator(name):
+    method = getattr(list, name)
+    def wrapped(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self._changed()
+        return result
+    wrapped.__name__ = name
+    return wrapped
+
+for _name in ('append', 'extend', 'insert', 'remove', 'pop', 'clear',
+              'sort', 'reverse', '__setitem__', '__delitem__', '__iadd__'):
+    setattr(ObservableList, _name, _mutator(_name))
+
+class Observable(object):
+    """
+    Data descriptor which requests a sync of the owner instance when the value is reassigned,
+    list value is wrapped by ObservableList to notice the in-place mutation as well
+
+    Argument
+        @default    value before the first assignment
+    """
+    def __init__(self, default=None):
+        super().__init__()
+        self.default = default
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = '_observable_{}'.format(name)
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return instance.__dict__.get(self.name, self.default)
+
+    def __set__(self, instance, value):
+        if isinstance(value, list):
+            value = ObservableList(value, callback=lambda: notify(instance))
+        instance.__dict__[self.name] = value
+        notify(instance)
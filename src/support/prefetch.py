@@ -0,0 +1,24 @@
+"""
+Support function to overlap the file reading with the processing
+"""
+
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+LOGGER = logging.getLogger(__name__)
+
+def prefetch_map(func, iterable, prefetch=4):
+    """
+    the same as map(func, iterable) but call func in background threads,
+    keep at most prefetch results in flight so that the memory stays bounded
+    """
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max(1, prefetch)) as executor:
+        for item in iterable:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= prefetch:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
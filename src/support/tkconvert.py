@@ -3,14 +3,22 @@ Some support function for tkinter
 """
 import logging
 import tkinter
+from collections import OrderedDict
 
 import cv2
 import numpy as np
 from PIL import Image, ImageTk
 
+from src.image.imnp import ImageNP
+
 LOGGER = logging.getLogger(__name__)
 
+# the recently used checkboard photos, the widgets keep their own reference of the evicted one
+CHECKBOARD_CACHE_SIZE = 8
+
 class TkConverter(object):
+    _checkboard_photos = OrderedDict()
+
     def __init__(self):
         super().__init__()
 
@@ -22,11 +30,26 @@ class TkConverter(object):
 
     @staticmethod
     def ndarray_to_photo(arr):
-        h, w = arr.shape[0], arr.shape[1]
-        byte_photo = Image.frombytes('L', (w, h), arr.astype('b').tostring())
+        byte_photo = Image.fromarray(np.ascontiguousarray(arr, dtype='uint8'))
         tk_photo = ImageTk.PhotoImage(byte_photo)
         return tk_photo
 
+    @staticmethod
+    def checkboard_photo(shape, block_size=10, color=125, master=None):
+        """PhotoImage of ImageNP.generate_checkboard, reused by the recent calls of the same tk interpreter"""
+        master = master or tkinter._default_root
+        key = (getattr(master, 'tk', None), tuple(shape), block_size, color)
+        photos = TkConverter._checkboard_photos
+        photo = photos.get(key)
+        if photo is None:
+            board = ImageNP.generate_checkboard(tuple(shape), block_size, color)
+            photo = photos[key] = ImageTk.PhotoImage(Image.fromarray(board), master=master)
+            while len(photos) > CHECKBOARD_CACHE_SIZE:
+                photos.popitem(last=False)
+        else:
+            photos.move_to_end(key)
+        return photo
+
     @staticmethod
     def cv2_to_photo(img):
         try:
@@ -38,3 +61,40 @@ class TkConverter(object):
             arr = Image.fromarray(img)
             photo = ImageTk.PhotoImage(arr)
             return photo
+
+class TkPhotoBuffer(object):
+    """
+    Keep one PhotoImage and a preallocated RGB(A) buffer for a widget,
+    convert the new pixels into the buffer and paste them into the same PhotoImage,
+    a new PhotoImage is only created when the image size or channel changes
+
+    Argument
+        @master     the widget which the PhotoImage belongs to
+    """
+    def __init__(self, master=None):
+        super().__init__()
+        self.master = master
+        self.photo = None
+        self._buffer = None
+
+    def update(self, img):
+        """update the photo by BGR, BGRA or grayscale uint8 image and return it"""
+        h, w = img.shape[:2]
+        if img.ndim == 3 and img.shape[2] == 4:
+            mode, code = 'RGBA', cv2.COLOR_BGRA2RGBA
+        elif img.ndim == 3:
+            mode, code = 'RGB', cv2.COLOR_BGR2RGB
+        else:
+            mode, code = 'RGB', cv2.COLOR_GRAY2RGB
+
+        if self._buffer is None or self._buffer.shape != (h, w, len(mode)):
+            self._buffer = np.empty((h, w, len(mode)), dtype='uint8')
+            self.photo = None
+        cv2.cvtColor(img, code, dst=self._buffer)
+        image = Image.frombuffer(mode, (w, h), self._buffer, 'raw', mode, 0, 1)
+
+        if self.photo is None:
+            self.photo = ImageTk.PhotoImage(image, master=self.master)
+        else:
+            self.photo.paste(image)
+        return self.photo
@@ -6,7 +6,6 @@ from inspect import currentframe, getframeinfo
 from tkinter import ttk
 sys.path.append('../..')
 
-from src.image.imnp import ImageNP
 from src.support.tkconvert import TkConverter
 from src.view.template import TkViewer
 from src.view.tkframe import TkFrame
@@ -15,6 +14,7 @@ from src.view.ttkstyle import TTKStyle, init_css
 __FILE__ = os.path.abspath(getframeinfo(currentframe()).filename)
 LOGGER = logging.getLogger(__name__)
 OUTFILE_TYPE = [('.npy', 'npy'), ('.dat', 'dat'), ('.txt', 'txt')]
+WARP_MODE = [(u'反向索引', 'inverse'), (u'逐幀轉換', 'warp')]
 
 
 class EntryThermalComponentViewer(TkViewer):
@@ -41,7 +41,7 @@ class EntryThermalComponentViewer(TkViewer):
         # body > option
         self.frame_option = TkFrame(self.frame_body)
         self.frame_option.grid(row=0, column=0, sticky='w')
-        self.set_all_grid_rowconfigure(self.frame_option, 0, 1)
+        self.set_all_grid_rowconfigure(self.frame_option, 0, 1, 2)
         self.set_all_grid_columnconfigure(self.frame_option, *[i for i in range(len(OUTFILE_TYPE)+1)])
 
         # body > upload
@@ -115,6 +115,18 @@ class EntryThermalComponentViewer(TkViewer):
             radiobtn.grid(row=1, column=i+1, sticky='w', padx=10)
             self.radiobtn_visual.append(radiobtn)
 
+        # option: warp mode
+        self.label_warp_mode = ttk.Label(self.frame_option, text=u'轉換模式: ', style='Title.TLabel')
+        self.label_warp_mode.grid(row=2, column=0, sticky='w')
+        self.val_warp_mode = tkinter.StringVar()
+        self.val_warp_mode.set('inverse')
+        self.radiobtn_warp_mode = []
+        for i, op in enumerate(WARP_MODE):
+            text, mode = op
+            radiobtn = ttk.Radiobutton(self.frame_option, text=text, variable=self.val_warp_mode, value=mode, style='H5.TRadiobutton')
+            radiobtn.grid(row=2, column=i+1, sticky='w', padx=10)
+            self.radiobtn_warp_mode.append(radiobtn)
+
         # upload: thermal txt directory
         self.label_thermal = ttk.Label(self.frame_upload, text=u'溫度檔資料夾: ', style='Title.TLabel')
         self.label_thermal.grid(row=0, column=0, sticky='w')
@@ -240,10 +252,8 @@ class PreviewComponentViewer(TkViewer):
         # cut > fl, fr, bl, br, body
         self.set_all_grid_rowconfigure(self.frame_cut, 0, 1)
         self.set_all_grid_columnconfigure(self.frame_cut, 0, 1, 2)
-        self.photo_small = ImageNP.generate_checkboard((self._im_h//2, self._im_w//3), 10)
-        self.photo_small = TkConverter.ndarray_to_photo(self.photo_small)
-        self.photo_large = ImageNP.generate_checkboard((self._im_h, self._im_w//3), 10)
-        self.photo_large = TkConverter.ndarray_to_photo(self.photo_large)
+        self.photo_small = TkConverter.checkboard_photo((self._im_h//2, self._im_w//3), 10)
+        self.photo_large = TkConverter.checkboard_photo((self._im_h, self._im_w//3), 10)
         self.label_cut_fl = ttk.Label(self.frame_cut, image=self.photo_small)
         self.label_cut_fl.grid(row=0, column=0, sticky='news')
         self.label_cut_fr = ttk.Label(self.frame_cut, image=self.photo_small)
@@ -6,7 +6,6 @@ from tkinter import ttk
 sys.path.append('../..')
 
 import cv2
-from src.image.imnp import ImageNP
 from src.support.tkconvert import TkConverter
 from src.view.template import TkViewer
 from src.view.tkfonts import TkFonts
@@ -118,6 +117,8 @@ class GraphCutViewer(TkViewer):
         self.label_state.grid(row=0, column=0, sticky='w')
         self.label_resize = ttk.Label(self.frame_head, text=u'原有尺寸 N/A-> 顯示尺寸 N/A', style='H2.TLabel')
         self.label_resize.grid(row=1, column=0, sticky='w')
+        self.label_symmetry = ttk.Label(self.frame_head, text=u'對稱軸 N/A', style='H2.TLabel')
+        self.label_symmetry.grid(row=2, column=0, sticky='w')
 
     # init body widget
     def _init_widget_body(self):
@@ -125,8 +126,7 @@ class GraphCutViewer(TkViewer):
         self.set_all_grid_rowconfigure(self.frame_panel, 0, 1)
         self.label_panel = ttk.Label(self.frame_panel, text='Input Panel', style='H2.TLabel')
         self.label_panel.grid(row=0, column=0, sticky='ns')
-        self.photo_panel = ImageNP.generate_checkboard((self._im_h, self._im_w), block_size=10)
-        self.photo_panel = TkConverter.ndarray_to_photo(self.photo_panel)
+        self.photo_panel = TkConverter.checkboard_photo((self._im_h, self._im_w), block_size=10)
         self.label_panel_image = ttk.Label(self.frame_panel, image=self.photo_panel)
         self.label_panel_image.grid(row=1, column=0, sticky='ns')
 
@@ -136,10 +136,8 @@ class GraphCutViewer(TkViewer):
 
         self.set_all_grid_rowconfigure(self.frame_display, 0, 1, 2)
         self.set_all_grid_columnconfigure(self.frame_display, 0, 1, 2)
-        self.photo_small = ImageNP.generate_checkboard((self._im_h//2, self._im_w//3), 10)
-        self.photo_small = TkConverter.ndarray_to_photo(self.photo_small)
-        self.photo_large = ImageNP.generate_checkboard((self._im_h, self._im_w//3), 10)
-        self.photo_large = TkConverter.ndarray_to_photo(self.photo_large)
+        self.photo_small = TkConverter.checkboard_photo((self._im_h//2, self._im_w//3), 10)
+        self.photo_large = TkConverter.checkboard_photo((self._im_h, self._im_w//3), 10)
         self.label_fl_image = ttk.Label(self.frame_display, image=self.photo_small)
         self.label_fl_image.grid(row=1, column=0)
         self.label_fr_image = ttk.Label(self.frame_display, image=self.photo_small)
@@ -13,7 +13,6 @@ from inspect import currentframe, getframeinfo
 from tkinter import ttk
 
 sys.path.append('../..')
-from src.image.imnp import ImageNP
 from src.support.tkconvert import TkConverter
 from src.view.template import ImageViewer, TkViewer
 from src.view.tkframe import TkFrame
@@ -42,7 +41,7 @@ class EntryMappingViewer(TkViewer):
         """body"""
         self.frame_body = TkFrame(self.frame_root)
         self.frame_body.grid(row=0, column=0, sticky='w')
-        self.set_all_grid_rowconfigure(self.frame_body, 0, 1)
+        self.set_all_grid_rowconfigure(self.frame_body, 0, 1, 2)
         self.set_all_grid_columnconfigure(self.frame_body, 0, 1)
 
         """footer"""
@@ -70,6 +69,11 @@ class EntryMappingViewer(TkViewer):
         self.label_temp.grid(row=1, column=0, sticky='w')
         self.label_temp_path = ttk.Label(self.frame_body, text=u'N/A', style='H5.TLabel')
         self.label_temp_path.grid(row=1, column=1, sticky='w')
+        self.label_rig = ttk.Label(self.frame_body, text=u'機台編號 (選填): ', style='H5Bold.TLabel')
+        self.label_rig.grid(row=2, column=0, sticky='w')
+        self.val_rig = tkinter.StringVar()
+        self.entry_rig = ttk.Entry(self.frame_body, textvariable=self.val_rig)
+        self.entry_rig.grid(row=2, column=1, sticky='w')
 
         """footer"""
         self.btn_img_path = ttk.Button(self.frame_footer, text=u'載入圖片', style='H5.TButton')
@@ -124,13 +128,14 @@ class AutoMappingViewer(TkViewer):
         # head: message
         self.label_head_msg = ttk.Label(self.frame_head, text=u'自動修正結果: 原圖-修正後溫度圖=結果圖', style='H1.TLabel')
         self.label_head_msg.grid(row=0, column=0, sticky='news')
+        self.label_score = ttk.Label(self.frame_head, text=u'對應分數: N/A', style='H2.TLabel')
+        self.label_score.grid(row=1, column=0, sticky='news')
 
         # body reconfig
         self.set_all_grid_columnconfigure(self.frame_body, 0, 1, 2, 3, 4,)
 
         # body: original
-        self.photo_original = ImageNP.generate_checkboard((self._im_h, self._im_w), block_size=10)
-        self.photo_original = TkConverter.ndarray_to_photo(self.photo_original)
+        self.photo_original = TkConverter.checkboard_photo((self._im_h, self._im_w), block_size=10)
         self.label_original = ttk.Label(self.frame_body, image=self.photo_original)
         self.label_original.grid(row=0, column=0, sticky='news')
 
@@ -139,8 +144,7 @@ class AutoMappingViewer(TkViewer):
         self.label_minus.grid(row=0, column=1, sticky='news', padx=10)
 
         # body: warp thermal
-        self.photo_warp_thermal = ImageNP.generate_checkboard((self._im_h, self._im_w), block_size=10)
-        self.photo_warp_thermal = TkConverter.ndarray_to_photo(self.photo_warp_thermal)
+        self.photo_warp_thermal = TkConverter.checkboard_photo((self._im_h, self._im_w), block_size=10)
         self.label_warp_thermal = ttk.Label(self.frame_body, image=self.photo_warp_thermal)
         self.label_warp_thermal.grid(row=0, column=2, sticky='news')
 
@@ -149,8 +153,7 @@ class AutoMappingViewer(TkViewer):
         self.label_equal.grid(row=0, column=3, sticky='news', padx=10)
 
         # body: result
-        self.photo_mapping_result = ImageNP.generate_checkboard((self._im_h, self._im_w), block_size=10)
-        self.photo_mapping_result = TkConverter.ndarray_to_photo(self.photo_mapping_result)
+        self.photo_mapping_result = TkConverter.checkboard_photo((self._im_h, self._im_w), block_size=10)
         self.label_mapping_result = ttk.Label(self.frame_body, image=self.photo_mapping_result)
         self.label_mapping_result.grid(row=0, column=4, sticky='news')
 
@@ -240,8 +243,7 @@ class ManualMappingViewer(TkViewer):
 
         """Panel/Display image"""
         # default output
-        self.photo_panel = ImageNP.generate_checkboard((239, 320), block_size=10)
-        self.photo_panel = TkConverter.ndarray_to_photo(self.photo_panel)
+        self.photo_panel = TkConverter.checkboard_photo((239, 320), block_size=10)
         self.photo_display = self.photo_panel
 
         self.label_panel_image = ttk.Label(self.frame_panel, image=self.photo_panel)
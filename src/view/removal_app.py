@@ -8,7 +8,6 @@ sys.path.append('../..')
 from PIL import Image
 
 import cv2
-from src.image.imnp import ImageNP
 from src.support.tkconvert import TkConverter
 from src.view.template import TkViewer
 from src.view.tkfonts import TkFonts
@@ -100,8 +99,7 @@ class RemovalViewer(TkViewer):
         # self.set_all_grid_rowconfigure(self.frame_panel, 0, 1)
         self.label_panel = ttk.Label(self.frame_panel, text='Input Panel', style='H2.TLabel')
         self.label_panel.grid(row=0, column=0, sticky='ns')
-        self.photo_panel = ImageNP.generate_checkboard((self._im_h, self._im_w), block_size=10)
-        self.photo_panel = TkConverter.ndarray_to_photo(self.photo_panel)
+        self.photo_panel = TkConverter.checkboard_photo((self._im_h, self._im_w), block_size=10)
         self.label_panel_image = ttk.Label(self.frame_panel, image=self.photo_panel)
         self.label_panel_image.grid(row=1, column=0, sticky='ns')
 
@@ -18,6 +18,7 @@ sys.path.append('../..')
 from src.actions.detector import TemplateDetector
 from src.image.imcv import ImageCV
 from src.image.imnp import ImageNP
+from src.support.observable import Observable
 from src.support.tkconvert import TkConverter
 from src.view.tkfonts import TkFonts
 from src.view.tkframe import TkFrame, TkLabelFrame
@@ -31,6 +32,7 @@ STATE = ['view', 'erase', 'edit', 'mirror', 'seperate', 'calc', 'result']
 class TkViewer(object):
     def __init__(self):
         super().__init__()
+        self._sync_pending = False
 
     # set grid all column configure
     def set_all_grid_columnconfigure(self, widget, *cols):
@@ -68,6 +70,26 @@ class TkViewer(object):
     def _init_style(self):
         init_css()
 
+    # schedule a sync in the next idle time, the requests before that are coalesced
+    def request_sync(self):
+        if getattr(self, '_sync_pending', True) or getattr(self, 'root', None) is None:
+            return
+        self._sync_pending = True
+        self.root.after_idle(self._run_sync)
+
+    # the state changes during sync won't request another sync
+    def _run_sync(self):
+        try:
+            self.sync()
+        except tkinter.TclError as e:
+            LOGGER.debug(e)
+        finally:
+            self._sync_pending = False
+
+    # render the widgets by current state, override by the viewer
+    def sync(self):
+        pass
+
     # inherit tkinter mainloop
     def mainloop(self):
         self.root.mainloop()
@@ -76,7 +98,8 @@ class TkViewer(object):
 class ImageViewer(TkViewer):
     """
     Assume all image paths in self.image_queue are unique,
-    show the image on ttk.Label named panel and sync the image to photo
+    show the image on ttk.Label named panel and sync the image to photo,
+    the widgets are re-rendered only when the observable state changes
 
     Argument:
         @current_image_path
@@ -87,6 +110,13 @@ class ImageViewer(TkViewer):
         @state_message      corresponding message with application state
         @root_state         application state
     """
+    current_image_path = Observable()
+    image_panel = Observable()
+    photo_panel = Observable()
+    photo_display = Observable()
+    state_message = Observable()
+    root_state = Observable()
+
     def __init__(self):
         super().__init__()
         self.current_image_path = None
@@ -251,8 +281,7 @@ class PreprocessViewer(ImageViewer):
 
         """Panel/Display image"""
         # default output
-        self.photo_panel = ImageNP.generate_checkboard((self._image_h, self._image_w), block_size=10)
-        self.photo_panel = TkConverter.ndarray_to_photo(self.photo_panel)
+        self.photo_panel = TkConverter.checkboard_photo((self._image_h, self._image_w), block_size=10)
         self.photo_display = self.photo_panel
 
         self.label_panel_image = ttk.Label(self.frame_panel, image=self.photo_panel)
@@ -293,8 +322,7 @@ class PreprocessViewer(ImageViewer):
 
     # init display panel
     def _init_display_panel(self):
-        resize_display = ImageNP.generate_checkboard((self._image_h, self._image_w), block_size=10)
-        self.photo_display = TkConverter.ndarray_to_photo(resize_display)
+        self.photo_display = TkConverter.checkboard_photo((self._image_h, self._image_w), block_size=10)
         self._sync_display()
 
     # init floodfill option
@@ -305,18 +333,13 @@ class PreprocessViewer(ImageViewer):
     # render the lastest panel image
     def _sync_image(self):
         self.root.wm_title(self.current_image_path)
-        self.root.update()
         if self.current_image_path is not None:
             self._sync_size_msg()
             self.label_panel_image.config(image=self.photo_panel)
-            if self.root and 'normal' == self.root.state():
-                self.label_panel_image.after(10, self._sync_image)
 
     # render the lastest display changed
     def _sync_display(self):
         self.label_display_image.config(image=self.photo_display)
-        if self.root and 'normal' == self.root.state():
-            self.label_display_image.after(10, self._sync_display)
 
     # render the lastest state
     def _sync_state(self):
@@ -332,10 +355,9 @@ class PreprocessViewer(ImageViewer):
 
         if 'result' in self.root_state and self.state_message != 'calc':
             msg += ' (按下 SPACE 儲存圖片)'
-        self.root_state = self.unique(self.root_state)
+        if len(set(self.root_state)) != len(self.root_state):
+            self.root_state = self.unique(self.root_state)
         self.label_state.configure(text=u'現在模式: {}'.format(msg))
-        if self.root and 'normal' == self.root.state():
-            self.label_state.after(10, self._sync_state)
 
     # render the image size image
     def _sync_size_msg(self):
@@ -345,8 +367,12 @@ class PreprocessViewer(ImageViewer):
             resize_w, resize_h, orig_w, orig_h
         )
         self.label_resize.configure(text=msg)
-        if self.root and 'normal' == self.root.state():
-            self.label_resize.after(10, self._sync_size_msg)
+
+    # render all widgets by current state
+    def sync(self):
+        self._sync_image()
+        self._sync_display()
+        self._sync_state()
 
     # update and auto resize the image if read the first image
     def _update_image(self, image_path=None, image=None):
@@ -404,7 +430,7 @@ class PreprocessViewer(ImageViewer):
 
     # inherit parent mainloop
     def mainloop(self):
-        self._sync_image()
+        self.request_sync()
         super().mainloop()
 
 # the interface to graphcut moth
@@ -422,6 +448,11 @@ class GraphcutViewer(ImageViewer):
         @symmetric_line     mirror line for moth
         @body_width         body width of moth
     """
+    image_panel_tmp = Observable()
+    panel_image_state = Observable()
+    symmetric_line = Observable()
+    body_width = Observable()
+
     def __init__(self):
         super().__init__()
         self.image_panel_tmp = []
@@ -560,8 +591,7 @@ class GraphcutViewer(ImageViewer):
         """Panel/Display image"""
         # default output
         self._image_w, self._image_h = 800, 533
-        self.photo_panel = ImageNP.generate_checkboard((self._image_h, self._image_w), block_size=10)
-        self.photo_panel = TkConverter.ndarray_to_photo(self.photo_panel)
+        self.photo_panel = TkConverter.checkboard_photo((self._image_h, self._image_w), block_size=10)
         self.photo_display = self.photo_panel
 
         self.label_panel_image = ttk.Label(self.frame_panel, image=self.photo_panel)
@@ -638,11 +668,8 @@ class GraphcutViewer(ImageViewer):
     # render the lastest panel image
     def _sync_image(self):
         self.root.wm_title(self.current_image_path)
-        self.root.update()
         self._draw()
         self.label_panel_image.config(image=self.photo_panel)
-        if self.root and 'normal' == self.root.state():
-            self.label_panel_image.after(10, self._sync_image)
 
     # render the lastest state
     def _sync_state(self):
@@ -660,8 +687,11 @@ class GraphcutViewer(ImageViewer):
         elif self.state_message == 'seperate':
             msg = u'切割'
         self.label_state.configure(text=u'現在模式: {}'.format(msg))
-        if self.root and 'normal' == self.root.state():
-            self.label_state.after(10, self._sync_state)
+
+    # render all widgets by current state
+    def sync(self):
+        self._sync_image()
+        self._sync_state()
 
     # draw meta data on image panel
     def _draw(self):
@@ -694,7 +724,7 @@ class GraphcutViewer(ImageViewer):
 
     # inherit parent mainloop
     def mainloop(self):
-        self._sync_image()
+        self.request_sync()
         super().mainloop()
 
 if __name__ == '__main__':
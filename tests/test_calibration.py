@@ -0,0 +1,31 @@
+import cv2
+import numpy as np
+
+from src.image.imnp import ImageNP
+from src.support.calibration import measure
+
+
+def _rect_metadata(w, h, body_width=None):
+    mask = np.zeros((200, 300), dtype='uint8')
+    mask[40:40+h, 60:60+w] = 255
+    cnts = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)[-2]
+    coor = tuple(i.tolist() for i in ImageNP.contour_to_coor(cnts[0]))
+    return {'image': {'resize': [100, 150], 'body_width': body_width}, 'fl': {'cnts': coor}}
+
+def test_measure_area_of_rectangle():
+    # contour of the pixel centers, (w-1) x (h-1)
+    result = measure(_rect_metadata(100, 50, body_width=100), px_per_mm=1)
+    assert result['area_mm2']['fl'] == 99 * 49
+    assert result['body_width_mm'] == 100
+
+def test_measure_scale_by_px_per_mm():
+    result = measure(_rect_metadata(101, 51), px_per_mm=10)
+    assert result['area_mm2']['fl'] == 50.0
+    assert result['area_mm2']['body'] is None
+
+def test_measure_odd_number_of_points():
+    metadata = {'image': {'resize': [1, 1]}, 'fl': {'cnts': ([0, 0, 4], [0, 4, 0])}}
+    assert measure(metadata, px_per_mm=1)['area_mm2']['fl'] == 8.0
+
+def test_measure_without_resize():
+    assert measure({'image': {}}, px_per_mm=1) == {'body_width_mm': None, 'area_mm2': None}
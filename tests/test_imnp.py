@@ -0,0 +1,25 @@
+import cv2
+import numpy as np
+import pytest
+
+from src.image.imnp import ImageNP
+
+
+def _symmetric_image(axis_x, angle, h=600, w=900, cy=300):
+    """dark polygon symmetric about x=axis_x, rotated about (axis_x, cy) with the bottom to the right"""
+    half = np.array([(0, -200), (150, -250), (260, -120), (120, 0), (230, 160), (90, 220), (0, 150)], float)
+    pts = np.vstack((half, (half * [-1, 1])[::-1]))
+    theta = np.deg2rad(angle)
+    rotation = np.array([[np.cos(theta), np.sin(theta)], [-np.sin(theta), np.cos(theta)]])
+    pts = pts.dot(rotation.T) + (axis_x, cy)
+    image = np.full((h, w, 3), 255, dtype='uint8')
+    cv2.fillPoly(image, [np.round(pts*256).astype('int32').reshape(-1, 1, 2)], (40, 40, 40), cv2.LINE_AA, 8)
+    return image
+
+@pytest.mark.parametrize('axis_x, angle', [(400, 0), (380.5, 0), (400, 6), (380.5, -4), (451.25, 3)])
+def test_generate_symmetric_axis(axis_x, angle):
+    (x, y), found_angle, confidence = ImageNP.generate_symmetric_axis(_symmetric_image(axis_x, angle))
+    expect_x = axis_x + (y-300) * np.tan(np.deg2rad(angle))
+    assert abs(x - expect_x) < 0.25
+    assert abs(found_angle - angle) < 0.2
+    assert confidence > 0.9